@@ -1,16 +1,21 @@
 # app.py
 
-from flask import Flask, render_template, request, Response, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, Response, redirect, url_for, flash, jsonify, stream_with_context, send_file
 import os
-import threading
-import uuid
+import json
+import tempfile
+import time
 from dotenv import load_dotenv
 
-from reddit_scraper import scrape_reddit_user
-from gemini_processor import process_content
+from reddit_scraper import scrape_reddit_user, scrape_cache, normalize_username
+from gemini_processor import process_content, report_cache, PROMPT_VERSION
 
 from extensions import db, login_manager, bcrypt, migrate
-from models import User
+from models import User, Job, user_cache
+from passwords import hash_password, check_password
+from jobs import job_queue
+from report_store import report_store
+import metrics
 from forms import RegistrationForm, LoginForm
 
 from flask_login import login_user, current_user, logout_user, login_required
@@ -25,6 +30,12 @@ app.secret_key = os.getenv("SECRET_KEY") or 'default_secret_key'  # Replace with
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or 'sqlite:///site.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS') or 2)  # Concurrent jobs per process
+app.config['JOB_QUEUE_LIMIT'] = int(os.getenv('JOB_QUEUE_LIMIT') or 50)  # Max queued jobs before rejecting new ones
+app.config['EVENT_STREAM_SECONDS'] = int(os.getenv('EVENT_STREAM_SECONDS') or 30)  # Seconds a progress stream stays open before the browser reconnects
+app.config['REPORT_STORE_DIR'] = os.getenv('REPORT_STORE_DIR') or os.path.join(tempfile.gettempdir(), 'reddit_gemini_reports')
+app.config['REPORT_STORE_TTL'] = int(os.getenv('REPORT_STORE_TTL') or 7 * 24 * 60 * 60)  # Seconds a report is kept after its last download
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS') or 12)  # Each extra round doubles the cost of a hash
 
 # Initialize extensions with the app
 db.init_app(app)
@@ -36,40 +47,51 @@ migrate.init_app(app, db)
 login_manager.login_view = 'login'  # Redirect to 'login' when login is required
 login_manager.login_message_category = 'info'
 
-# Global dictionary to track tasks
-tasks = {}
+# Progress dicts of the jobs running in this process (persisted to the Job table)
+tasks = job_queue.tasks
 
 def background_task(username, task_id):
     """
     Background task to scrape Reddit data and process it through Gemini API.
     Updates the tasks dictionary with progress.
     """
+    scraped_data_path = None
     try:
         tasks[task_id]['progress'] = 'Scraping Reddit data...'
-        scraped_data = scrape_reddit_user(username, task_id, tasks)
-        if not scraped_data:
+        with metrics.timed('scrape', tasks[task_id]):
+            scraped_data_path = scrape_reddit_user(username, task_id, tasks)
+        if not scraped_data_path:
             tasks[task_id]['progress'] = 'Failed to scrape Reddit data.'
             tasks[task_id]['status'] = 'Failed'
             return
 
         tasks[task_id]['progress'] = 'Processing data through Gemini API...'
-        structured_report_path = process_content(username, scraped_data, task_id, tasks)
+        with metrics.timed('analyze', tasks[task_id]):
+            structured_report_path = process_content(username, scraped_data_path, task_id, tasks)
         if not structured_report_path or not os.path.exists(structured_report_path):
-            tasks[task_id]['progress'] = 'Failed to process data with Gemini API.'
+            if tasks[task_id].get('status') != 'Failed':  # Keep the reason process_content gave
+                tasks[task_id]['progress'] = 'Failed to process data with Gemini API.'
             tasks[task_id]['status'] = 'Failed'
             return
 
+        tasks[task_id]['report_id'] = report_store.add(structured_report_path)
+        tasks[task_id]['report_path'] = None  # Moved into the report store
         tasks[task_id]['progress'] = 'Report generated successfully.'
         tasks[task_id]['status'] = 'Completed'
-        tasks[task_id]['report_path'] = structured_report_path
 
     except Exception as e:
         print(f"Error in background task: {e}")
         tasks[task_id]['progress'] = 'An unexpected error occurred.'
         tasks[task_id]['status'] = 'Failed'
 
-def get_unique_task_id():
-    return uuid.uuid4().hex
+    finally:
+        # The scraped data file is only needed while the report is generated
+        if scraped_data_path and os.path.exists(scraped_data_path):
+            os.remove(scraped_data_path)
+
+# Run queued jobs on a fixed-size worker pool
+job_queue.init_app(app, handler=background_task)
+report_store.init_app(app)
 
 @app.route('/', methods=['GET', 'POST'])
 @login_required  # Require login for the main page
@@ -80,24 +102,16 @@ def index():
             flash('Please enter a Reddit username.', 'danger')
             return redirect(url_for('index'))
 
-        # Generate a unique task ID
-        task_id = get_unique_task_id()
-        tasks[task_id] = {
-            'progress': 'Task started.',
-            'status': 'In Progress',
-            'report_path': None,
-            'total_posts': 0,
-            'scraped_posts': 0,
-            'total_comments': 0,
-            'scraped_comments': 0
-        }
-
-        # Start background thread
-        thread = threading.Thread(target=background_task, args=(reddit_username, task_id))
-        thread.start()
+        # Queue the job for the worker pool, or follow the identical job that is already
+        # queued or running for this account
+        coalesce_key = f"{normalize_username(reddit_username)}:v{PROMPT_VERSION}"
+        job = job_queue.submit(reddit_username, user_id=current_user.id, coalesce_key=coalesce_key)
+        if job is None:
+            flash('The server is busy right now. Please try again in a few minutes.', 'warning')
+            return redirect(url_for('index'))
 
         flash('Your request is being processed. Please wait...', 'info')
-        return redirect(url_for('progress_page', task_id=task_id))
+        return redirect(url_for('progress_page', task_id=job.id))
 
     return render_template('index.html')
 
@@ -107,7 +121,7 @@ def progress_page(task_id):
     """
     Render the progress page with a progress bar.
     """
-    if task_id not in tasks:
+    if db.session.get(Job, task_id) is None:
         flash('Invalid task ID.', 'danger')
         return redirect(url_for('index'))
     return render_template('progress.html', task_id=task_id)
@@ -118,66 +132,166 @@ def status(task_id):
     """
     Endpoint to get the current status of the task.
     """
-    if task_id not in tasks:
+    job = db.session.get(Job, task_id)
+    if job is None:
         return jsonify({'status': 'Invalid task ID.'}), 404
 
-    task = tasks[task_id]
-    total_posts = task.get('total_posts', 0)
-    scraped_posts = task.get('scraped_posts', 0)
-    total_comments = task.get('total_comments', 0)
-    scraped_comments = task.get('scraped_comments', 0)
-
     return jsonify({
-        'status': task.get('status', 'Unknown'),
-        'progress': task.get('progress', ''),
-        'total_posts': total_posts,
-        'scraped_posts': scraped_posts,
-        'total_comments': total_comments,
-        'scraped_comments': scraped_comments
+        'status': job.status,
+        'progress': job.progress or '',
+        'queue_position': job_queue.queue_position(job),
+        'total_posts': job.total_posts,
+        'scraped_posts': job.scraped_posts or 0,
+        'total_comments': job.total_comments,
+        'scraped_comments': job.scraped_comments or 0,
+        'generated_tokens': job.generated_tokens or 0,
+        'timings': job.timings or {}
     })
 
+@app.route('/events/<task_id>', methods=['GET'])
+@login_required
+def events(task_id):
+    """
+    Server-Sent Events stream of the task's progress.
+    Sends the full state first, then only the fields that changed.
+    Each open stream occupies a request thread, so a stream ends after
+    EVENT_STREAM_SECONDS and the browser's EventSource reconnects, receiving
+    the full state again; this keeps long jobs from pinning workers.
+    """
+    if db.session.get(Job, task_id) is None:
+        return jsonify({'status': 'Invalid task ID.'}), 404
+    deadline = time.monotonic() + app.config['EVENT_STREAM_SECONDS']
+    # Give the connection back to the pool: the stream stays open far longer than a request
+    db.session.close()
+
+    def generate():
+        sent = {}
+        version = None
+        yield "retry: 1000\n\n"  # Reconnect one second after the stream ends
+        while True:
+            snapshot = job_queue.snapshot(task_id)
+            db.session.close()  # Don't hold a connection while waiting for the next change
+            if snapshot is None:
+                yield f"event: error\ndata: {json.dumps({'status': 'Invalid task ID.'})}\n\n"
+                return
+
+            delta = {key: value for key, value in snapshot.items() if sent.get(key, object()) != value}
+            if delta:
+                sent.update(delta)
+                yield f"data: {json.dumps(delta)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+
+            remaining = deadline - time.monotonic()
+            if snapshot['status'] in ('Completed', 'Failed') or remaining <= 0:
+                return
+            version = job_queue.wait_for_change(task_id, version, timeout=min(remaining, 15.0))
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let nginx buffer the stream
+    })
+
+@app.route('/partial/<task_id>', methods=['GET'])
+@login_required
+def partial_report(task_id):
+    """
+    The part of the report generated so far, while Gemini is still streaming it.
+    Supports Range requests, so the progress page only fetches the new text.
+    """
+    # Jobs running in this process know their report file before it reaches the database
+    state = job_queue.tasks.get(task_id)
+    if state is not None:
+        report_path = state.get('report_path')
+    else:
+        job = db.session.get(Job, task_id)
+        if job is None:
+            return jsonify({'status': 'Invalid task ID.'}), 404
+        report_path = job.report_path if job.status in ('In Progress', 'Processing') else None
+    if not report_path:
+        return '', 204
+    try:
+        return send_file(report_path, mimetype='text/markdown', conditional=True, etag=False, max_age=0)
+    except FileNotFoundError:
+        # The report was finished and moved into the report store meanwhile
+        return '', 204
+
 @app.route('/download/<task_id>', methods=['GET'])
 @login_required
 def download(task_id):
     """
     Endpoint to download the generated report.
     """
-    if task_id not in tasks:
+    job = db.session.get(Job, task_id)
+    if job is None:
         flash('Invalid task ID.', 'danger')
         return redirect(url_for('index'))
-    if tasks[task_id]['status'] != 'Completed':
+    if job.status != 'Completed':
         flash('Report is not ready yet.', 'warning')
         return redirect(url_for('progress_page', task_id=task_id))
 
-    report_path = tasks[task_id]['report_path']
+    # Serve the pre-compressed copy to clients that accept gzip
+    compressed = request.accept_encodings['gzip'] > 0
+    report_path = report_store.path(job.report_id, compressed) if job.report_id else None
     if not report_path or not os.path.exists(report_path):
         flash('Report file not found.', 'danger')
         return redirect(url_for('index'))
-
-    # Define a generator to stream the file and delete it after sending
-    def generate():
-        with open(report_path, 'rb') as f:
-            while True:
-                chunk = f.read(4096)
-                if not chunk:
-                    break
-                yield chunk
-        # Delete the file after streaming
-        os.remove(report_path)
-        # Remove the task from the dictionary
-        del tasks[task_id]
-
-    return Response(generate(), mimetype='text/markdown', headers={
-        'Content-Disposition': f'attachment; filename="{os.path.basename(report_path)}"'
+    report_store.touch(job.report_id)
+
+    # send_file handles If-None-Match and Range requests, and lets the WSGI server
+    # use sendfile() for the body. Reports are content-addressed, so the id is a strong ETag.
+    response = send_file(
+        report_path,
+        mimetype='text/markdown',
+        as_attachment=True,
+        download_name=f"{job.reddit_username}_report.md",
+        etag=f"{job.report_id}-gzip" if compressed else job.report_id,
+        conditional=True,
+    )
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    return response
+
+@app.route('/cache/stats', methods=['GET'])
+@login_required
+def cache_stats():
+    """
+    Hit/miss counters and sizes of the scrape and report caches (for this process).
+    """
+    return jsonify({
+        'scrape_cache': scrape_cache.stats(),
+        'report_cache': report_cache.stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Pipeline metrics of this process in the Prometheus text format.
+    """
+    caches = [(name, cache.stats()) for name, cache in (('scrape', scrape_cache), ('report', report_cache), ('user', user_cache))]
+    # Grouped by metric, as the exposition format wants all samples of a metric together
+    counters = [
+        (f'cache_{key}_total', stats[key], {'cache': name}, f'Scrape, report and user cache {key} since the process started.')
+        for key in ('hits', 'misses') for name, stats in caches
+    ]
+    gauges = [
+        (f'cache_{key}', stats[key], {'cache': name}, f'Scrape, report and user cache size in {key}.')
+        for key in ('entries', 'bytes') for name, stats in caches if key in stats
+    ]
+    for job_status, count in db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status):
+        gauges.append(('jobs', count, {'status': job_status}, 'Jobs in the shared job table, by status.'))
+
+    return Response(metrics.render_prometheus(gauges, counters), mimetype='text/plain; version=0.0.4')
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = hash_password(form.password.data)
         user = User(username=form.username.data, email=form.email.data, password=hashed_password)
         db.session.add(user)
         db.session.commit()
@@ -191,8 +305,8 @@ def login():
         return redirect(url_for('index'))
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        user = User.find_by_email(form.email.data)
+        if user and check_password(user.password, form.password.data):
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             flash('Logged in successfully!', 'success')
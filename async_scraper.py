@@ -0,0 +1,239 @@
+# async_scraper.py
+
+# Asyncio scraping engine (REDDIT_SCRAPE_ENGINE=async). All jobs in the process share
+# one event loop running in a background thread, one asyncpraw client and one pooled
+# aiohttp session, so the Reddit requests in flight are bounded by the connection pool
+# rather than by threads. Only imported when the engine is used.
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import metrics
+from reddit_scraper import (
+    RETRY_BACKOFF_FACTOR,
+    RedditRateLimiter,
+    ScrapeError,
+    comment_record,
+    post_record,
+    reddit_client_settings,
+    referenced_fullnames,
+    scraping_progress,
+)
+
+# Connections kept open to Reddit, shared by all jobs in this process
+ASYNC_CONNECTIONS = int(os.getenv("REDDIT_ASYNC_CONNECTIONS") or 20)
+
+RESOLVING_PROGRESS = 'Resolving parent comments and posts...'
+
+class AsyncScrapeEngine:
+    """
+    Event loop thread plus the asyncpraw client and aiohttp session used on it.
+    Coroutines are submitted from job threads with submit().
+    """
+
+    def __init__(self, connections=ASYNC_CONNECTIONS):
+        self.connections = connections
+        self.loop = asyncio.new_event_loop()
+        self.reddit = None
+        self.session = None
+        self.rate_limiter = RedditRateLimiter(lambda: self.reddit)
+        self._thread = threading.Thread(target=self.loop.run_forever, name="reddit-async-loop", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+
+    async def _open(self):
+        import aiohttp
+        import asyncpraw
+
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.connections))
+        self.reddit = asyncpraw.Reddit(**reddit_client_settings(), requestor_kwargs={"session": self.session})
+
+    async def _close(self):
+        await self.reddit.close()
+        await self.session.close()
+
+    def submit(self, coro):
+        """
+        Run a coroutine on the engine's loop. Returns a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self):
+        if self.loop.is_running():
+            self.submit(self._close()).result(timeout=10)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Return the process-wide engine, starting it on the first call.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncScrapeEngine()
+                atexit.register(_engine.close)
+    return _engine
+
+async def acquire(rate_limiter):
+    """
+    Wait without blocking the loop until a request fits in the rate-limit window.
+    """
+    while True:
+        wait_time = rate_limiter.try_acquire()
+        if not wait_time:
+            return
+        print(f"Reddit rate limit budget used up. Waiting {wait_time:.0f} seconds...")
+        await asyncio.sleep(wait_time)
+
+async def wait_and_retry(engine, func, retries=5, backoff_factor=RETRY_BACKOFF_FACTOR):
+    """
+    Async counterpart of reddit_scraper.wait_and_retry: await `func()`, retrying
+    rate limit and server errors.
+    """
+    from asyncprawcore.exceptions import RequestException, ServerError, ResponseException, Forbidden
+
+    attempt = 0
+    while attempt < retries:
+        try:
+            return await func()
+        except Forbidden:
+            print("Access forbidden. Skipping...")
+            return None
+        except (RequestException, ServerError, ResponseException) as e:
+            attempt += 1
+            metrics.inc("reddit_retries_total", help_text="Reddit API calls retried after an error.")
+            wait_time = max(backoff_factor ** attempt, engine.rate_limiter.wait_time())
+            print(f"Error: {e}. Retrying in {wait_time:.0f} seconds...")
+            await asyncio.sleep(wait_time)
+    print(f"Failed after {retries} attempts.")
+    return None
+
+async def fetch_listing(engine, listing, to_record, known_fullnames, counts, key, page_size=100, checkpoint=None, name=None):
+    """
+    Async counterpart of reddit_scraper.fetch_listing. Counts items in counts[key].
+    Checkpoints are written from a worker thread so the loop is not blocked.
+    """
+    records, after, done = checkpoint.resume(name, known_fullnames) if checkpoint else ([], None, False)
+    stop = None
+    while not done:
+        params = {"after": after} if after else {}
+        await acquire(engine.rate_limiter)
+        metrics.inc("reddit_api_calls_total", help_text="Reddit API requests made.", endpoint="listing")
+        page = await wait_and_retry(engine, lambda: collect(listing.new(limit=page_size, params=params)))
+        if page is None:
+            raise ScrapeError(f"could not fetch the {name or 'listing'} page after {after or 'the first item'}")
+        for thing in page:
+            if thing.fullname in known_fullnames:
+                done = True
+                stop = thing.fullname
+                break
+            try:
+                records.append(to_record(thing))
+                counts[key] += 1
+            except Exception as item_error:
+                print(f"Error with item {thing.fullname}: {item_error}")
+        # Only an empty page ends a listing: Reddit may return short pages when it filters items out
+        if not page:
+            done = True
+        elif not done:
+            after = page[-1].fullname
+        if checkpoint and checkpoint.update(name, records, after, done, stop):
+            await asyncio.to_thread(checkpoint.save)
+    return records
+
+async def collect(generator):
+    return [thing async for thing in generator]
+
+async def resolve_fullnames(engine, fullnames, batch_size=100):
+    """
+    Async counterpart of reddit_scraper.resolve_fullnames; the batches are fetched concurrently.
+    """
+    unique_fullnames = list(dict.fromkeys(fullnames))
+
+    async def fetch_batch(batch):
+        await acquire(engine.rate_limiter)
+        metrics.inc("reddit_api_calls_total", help_text="Reddit API requests made.", endpoint="info")
+        things = await wait_and_retry(engine, lambda: collect(engine.reddit.info(fullnames=batch)))
+        if things is None:
+            raise ScrapeError(f"could not resolve {len(batch)} parent comments and posts")
+        return things
+
+    batches = await gather_or_cancel([
+        fetch_batch(unique_fullnames[start:start + batch_size])
+        for start in range(0, len(unique_fullnames), batch_size)
+    ])
+    return {thing.fullname: thing for things in batches for thing in things}
+
+async def gather_or_cancel(coros):
+    """
+    asyncio.gather that cancels the remaining coroutines as soon as one fails,
+    so a failed scrape stops making requests.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+async def fetch_user_items_async(engine, username, known_fullnames, counts, stage_times, checkpoint=None):
+    user = await wait_and_retry(engine, lambda: engine.reddit.redditor(username))
+    if not user:
+        return None
+
+    start = time.monotonic()
+    new_posts, new_comments = await gather_or_cancel([
+        fetch_listing(engine, user.submissions, post_record, known_fullnames, counts, 'scraped_posts', checkpoint=checkpoint, name='posts'),
+        fetch_listing(engine, user.comments, comment_record, known_fullnames, counts, 'scraped_comments', checkpoint=checkpoint, name='comments'),
+    ])
+    stage_times['scrape_listings'] = time.monotonic() - start
+
+    counts['resolving'] = True
+    start = time.monotonic()
+    resolved = await resolve_fullnames(engine, referenced_fullnames(new_comments))
+    stage_times['resolve_parents'] = time.monotonic() - start
+    return new_posts, new_comments, resolved
+
+def fetch_user_items(username, known_fullnames, task, checkpoint=None, poll_interval=0.5):
+    """
+    Async engine version of reddit_scraper.fetch_user_items, called from a job thread.
+    The scrape runs on the engine's loop; this thread only copies the counts into
+    `task` while waiting, so database writes for progress never block the loop.
+    """
+    engine = get_engine()
+    counts = {
+        'scraped_posts': checkpoint.count('posts') if checkpoint else 0,
+        'scraped_comments': checkpoint.count('comments') if checkpoint else 0,
+        'resolving': False,
+    }
+    stage_times = {}
+    future = engine.submit(fetch_user_items_async(engine, username, known_fullnames, counts, stage_times, checkpoint))
+
+    def report_progress():
+        if (counts['scraped_posts'], counts['scraped_comments']) != (task['scraped_posts'], task['scraped_comments']):
+            task['scraped_posts'] = counts['scraped_posts']
+            task['scraped_comments'] = counts['scraped_comments']
+            task['progress'] = scraping_progress(counts['scraped_posts'], counts['scraped_comments'])
+        if counts['resolving'] and task['progress'] != RESOLVING_PROGRESS:
+            task['progress'] = RESOLVING_PROGRESS
+
+    while True:
+        try:
+            result = future.result(timeout=poll_interval)
+            break
+        except FutureTimeoutError:
+            report_progress()
+    report_progress()
+
+    for stage, seconds in stage_times.items():
+        metrics.record_stage(stage, seconds, task)
+    return result
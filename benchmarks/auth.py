@@ -0,0 +1,181 @@
+# benchmarks/auth.py
+
+"""
+Load test of the authenticated hot path: /status polls with the user loader
+going to the database every request versus served from the in-process user cache,
+and concurrent logins at a given bcrypt cost.
+
+    python -m benchmarks.auth --threads 8 --duration 5 --rounds 12
+
+Runs the app in-process through Flask test clients against a temporary SQLite
+database, so no server or credentials are needed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+PASSWORD = "benchmark-password"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to poll /status for in each mode")
+    parser.add_argument("--logins", type=int, default=32, help="logins to time")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_LOG_ROUNDS")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args(argv)
+
+def configure_environment(args, workdir):
+    os.environ.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        "BCRYPT_LOG_ROUNDS": str(args.rounds),
+        "JOB_WORKERS": "1",
+    })
+
+def logged_in_client(webapp, email):
+    client = webapp.app.test_client()
+    response = client.post("/login", data={"email": email, "password": PASSWORD})
+    assert response.status_code == 302, response.status_code
+    return client
+
+def poll_status(webapp, clients, duration):
+    """
+    Poll /status from every client until `duration` has passed. Returns requests/s
+    and the number of SQL statements run per request.
+    """
+    from extensions import db
+
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    stop = threading.Event()
+    counts = [0] * len(clients)
+
+    def run(i):
+        while not stop.is_set():
+            response = clients[i].get("/status/benchmark")
+            assert response.status_code == 200, response.status_code
+            counts[i] += 1
+
+    with webapp.app.app_context():
+        engine = db.engine
+    db.event.listen(engine, "before_cursor_execute", count_statement)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clients))]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    db.event.remove(engine, "before_cursor_execute", count_statement)
+
+    requests = sum(counts)
+    return {
+        "requests": requests,
+        "requests_per_second": round(requests / elapsed, 1),
+        "queries_per_request": round(statements[0] / requests, 2),
+    }
+
+def time_logins(webapp, email, logins, threads):
+    """
+    Log in `logins` times from `threads` threads. Returns throughput and latency.
+    """
+    latencies = []
+    lock = threading.Lock()
+    remaining = [logins]
+
+    def run():
+        client = webapp.app.test_client()
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            start = time.monotonic()
+            response = client.post("/login", data={"email": email, "password": PASSWORD})
+            elapsed = time.monotonic() - start
+            assert response.status_code == 302, response.status_code
+            client.get("/logout")
+            with lock:
+                latencies.append(elapsed)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - start
+    return {
+        "logins_per_second": round(logins / elapsed, 1),
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+    }
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="reddit_gemini_auth_")
+    configure_environment(args, workdir)
+    try:
+        import app as webapp
+        from extensions import db
+        from models import Job, User, user_cache
+        from passwords import hash_password
+
+        webapp.app.config["WTF_CSRF_ENABLED"] = False
+        email = "benchmark@example.com"
+        with webapp.app.app_context():
+            db.create_all()
+            db.session.add(User(username="benchmark", email=email, password=hash_password(PASSWORD)))
+            db.session.add(Job(id="benchmark", reddit_username="benchmark", status="Completed"))
+            db.session.commit()
+
+        clients = [logged_in_client(webapp, email) for _ in range(args.threads)]
+        results = {"threads": args.threads, "bcrypt_rounds": args.rounds}
+
+        cache_ttl = user_cache.ttl
+        user_cache.ttl = 0
+        user_cache.clear()
+        results["status_uncached"] = poll_status(webapp, clients, args.duration)
+        user_cache.ttl = cache_ttl
+        results["status_cached"] = poll_status(webapp, clients, args.duration)
+        results["user_cache"] = user_cache.stats()
+        results["login"] = time_logins(webapp, email, args.logins, args.threads)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    uncached, cached = results["status_uncached"], results["status_cached"]
+    login = results["login"]
+    print()
+    print(f"/status, user from DB:    {uncached['requests_per_second']} req/s ({uncached['queries_per_request']} queries/request)")
+    print(f"/status, user cache:      {cached['requests_per_second']} req/s ({cached['queries_per_request']} queries/request)")
+    print(f"Speedup:                  {cached['requests_per_second'] / uncached['requests_per_second']:.2f}x with {results['threads']} clients")
+    print(f"Logins ({results['bcrypt_rounds']} rounds):       {login['logins_per_second']}/s, p50 {login['latency_p50_s']}s, p95 {login['latency_p95_s']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/fake_reddit_server.py
+
+"""
+Local HTTP server speaking the parts of the Reddit API the scraper uses, backed by
+a FakeReddit from benchmarks/fakes.py. Unlike the in-process fakes it exercises the
+real PRAW / asyncpraw clients and their connection handling.
+
+Point the clients at it with REDDIT_OAUTH_URL and REDDIT_URL set to server.url.
+"""
+
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+from prawcore.exceptions import ResponseException
+
+from benchmarks.fakes import FakeSubmission
+
+def thing_json(thing):
+    """
+    Reddit's JSON representation of a fake submission or comment.
+    """
+    if isinstance(thing, FakeSubmission):
+        return {"kind": "t3", "data": {
+            "id": thing.id,
+            "name": thing.fullname,
+            "author": "benchmark",
+            "subreddit": thing.subreddit,
+            "title": thing.title,
+            "selftext": thing.selftext,
+            "url": thing.url,
+            "created_utc": thing.created_utc,
+        }}
+    return {"kind": "t1", "data": {
+        "id": thing.id,
+        "name": thing.fullname,
+        "author": "benchmark",
+        "subreddit": thing.subreddit,
+        "body": thing.body,
+        "link_id": thing.link_id,
+        "link_title": thing.link_title,
+        "parent_id": thing.parent_id,
+        "created_utc": thing.created_utc,
+    }}
+
+def listing_json(things, after=None):
+    return {"kind": "Listing", "data": {
+        "after": after,
+        "before": None,
+        "dist": len(things),
+        "children": [thing_json(thing) for thing in things],
+    }}
+
+class FakeRedditServer:
+    """
+    Serves a FakeReddit over HTTP on a background event loop. Every API request
+    waits `latency` seconds without blocking other requests, and responses carry
+    X-Ratelimit headers from the fake's rate limit (or a budget that is never used up).
+    """
+
+    def __init__(self, reddit, latency=0.0, host="127.0.0.1", port=0):
+        self.reddit = reddit
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.failures = {}  # Listing endpoint -> [calls served before failing, failures left]
+        self._runner = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.loop.run_forever, name="fake-reddit-server", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/api/v1/access_token", self.access_token)
+        app.router.add_get("/{path:.*}", self.api)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def fail_listing(self, endpoint, after_pages, failures):
+        """
+        Answer the next `failures` requests for a listing ('submissions' or 'comments')
+        with a 500 once `after_pages` of its pages have been served.
+        """
+        self.failures[endpoint] = [after_pages, failures]
+
+    def should_fail(self, endpoint):
+        failure = self.failures.get(endpoint)
+        if failure is None or failure[1] <= 0 or self.reddit.auth.calls[endpoint] < failure[0]:
+            return False
+        failure[1] -= 1
+        return True
+
+    def rate_limit_headers(self):
+        limits = self.reddit.auth.limits
+        if limits["remaining"] is None:
+            return {"x-ratelimit-remaining": "1000000", "x-ratelimit-used": "0", "x-ratelimit-reset": "600"}
+        return {
+            "x-ratelimit-remaining": str(limits["remaining"]),
+            "x-ratelimit-used": str(limits["used"]),
+            "x-ratelimit-reset": str(int(max(limits["reset_timestamp"] - time.time(), 0))),
+        }
+
+    async def access_token(self, request):
+        return web.json_response({"access_token": "benchmark", "token_type": "bearer", "expires_in": 86400, "scope": "*"})
+
+    async def api(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parts = request.match_info["path"].strip("/").split("/")
+        try:
+            if parts[:1] == ["user"] and len(parts) == 3 and parts[2] in ("submitted", "comments"):
+                if self.should_fail("submissions" if parts[2] == "submitted" else "comments"):
+                    return web.json_response({"error": 500, "message": "Internal Server Error"}, status=500)
+                user = self.reddit.users.get(parts[1].lower())
+                if user is None:
+                    return web.json_response({"error": 404, "message": "Not Found"}, status=404)
+                listing = user.submissions if parts[2] == "submitted" else user.comments
+                limit = int(request.query.get("limit", 100))
+                page = list(listing.new(limit=limit, params={"after": request.query.get("after")}))
+                after = page[-1].fullname if len(page) == limit else None
+                body = listing_json(page, after)
+            elif parts == ["api", "info"]:
+                fullnames = [fullname for fullname in request.query.get("id", "").split(",") if fullname]
+                body = listing_json(self.reddit.info(fullnames))
+            else:
+                return web.json_response({"error": 404, "message": "Not Found"}, status=404)
+        except ResponseException:
+            return web.json_response({"error": 429, "message": "Too Many Requests"}, status=429, headers=self.rate_limit_headers())
+        return web.json_response(body, headers=self.rate_limit_headers())
@@ -0,0 +1,336 @@
+# benchmarks/fakes.py
+
+"""
+Local stand-ins for the Reddit (PRAW) and Gemini clients, so the pipeline can be
+benchmarked without credentials or network access. They implement only what
+reddit_scraper and gemini_processor use.
+"""
+
+import os
+import random
+import threading
+import time
+import types
+from collections import Counter
+
+from prawcore.exceptions import ResponseException
+
+SUBREDDITS = ("AskReddit", "python", "worldnews", "gaming", "science", "movies", "fitness", "cooking")
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog reddit python thread comment post really think "
+    "people because actually never always maybe probably interesting point agree disagree"
+).split()
+
+def _sentence(rng, min_words=8, max_words=40):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize() + "."
+
+class FakeRedditBackend:
+    """
+    Shared request accounting for the fake Reddit API: simulated latency, per-endpoint
+    call counts and a rate limit reported through auth.limits like Reddit's headers.
+    Requests over the limit fail with a 429 ResponseException.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=None, window=600.0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.calls = Counter()
+        self.rejected = 0
+        self._used = 0
+        self._reset_at = time.time() + window
+        self._seen_request = False
+        self._lock = threading.Lock()
+
+    def request(self, endpoint):
+        with self._lock:
+            now = time.time()
+            if now >= self._reset_at:
+                self._reset_at = now + self.window
+                self._used = 0
+            self.calls[endpoint] += 1
+            self._seen_request = True
+            if self.rate_limit is not None and self._used >= self.rate_limit:
+                self.rejected += 1
+                raise ResponseException(types.SimpleNamespace(status_code=429, headers={}))
+            self._used += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def limits(self):
+        # Like PRAW, nothing is known before the first response
+        if self.rate_limit is None or not self._seen_request:
+            return {"remaining": None, "reset_timestamp": None, "used": None}
+        with self._lock:
+            return {"remaining": self.rate_limit - self._used, "reset_timestamp": self._reset_at, "used": self._used}
+
+class FakeSubmission:
+    def __init__(self, post_id, subreddit, title, selftext, created_utc):
+        self.id = post_id
+        self.fullname = f"t3_{post_id}"
+        self.subreddit = subreddit
+        self.title = title
+        self.selftext = selftext
+        self.url = f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/"
+        self.created_utc = created_utc
+
+class FakeComment:
+    def __init__(self, comment_id, subreddit, body, submission, parent_id, created_utc):
+        self.id = comment_id
+        self.fullname = f"t1_{comment_id}"
+        self.subreddit = subreddit
+        self.body = body
+        self.link_id = submission.fullname
+        self.link_title = submission.title
+        self.parent_id = parent_id
+        self.is_root = parent_id.startswith("t3_")
+        self.created_utc = created_utc
+
+class FakeListing:
+    def __init__(self, backend, endpoint, items):
+        self.backend = backend
+        self.endpoint = endpoint
+        self.items = items  # Newest first
+        self._positions = {item.fullname: i for i, item in enumerate(items)}
+
+    def new(self, limit=None, params=None):
+        """
+        One page per call, like one ListingGenerator request with limit <= 100.
+        """
+        self.backend.request(self.endpoint)
+        after = (params or {}).get("after")
+        start = self._positions[after] + 1 if after in self._positions else 0
+        end = len(self.items) if limit is None else start + limit
+        return iter(self.items[start:end])
+
+    def prepend(self, items):
+        """
+        Add items newer than every existing one, as new activity does.
+        """
+        self.items[:0] = items
+        self._positions = {item.fullname: i for i, item in enumerate(self.items)}
+
+class FakeRedditor:
+    def __init__(self, name, submissions, comments):
+        self.name = name
+        self.submissions = submissions
+        self.comments = comments
+
+class FakeReddit:
+    """
+    Fake praw.Reddit holding synthetic users. Use add_user() to create them.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=None, window=600.0, seed=0):
+        self.auth = FakeRedditBackend(latency, rate_limit, window)
+        self.things = {}
+        self.users = {}
+        self._rng = random.Random(seed)
+        self._next_id = 0
+
+    def _new_id(self):
+        self._next_id += 1
+        return format(self._next_id, "x")
+
+    def add_user(self, name, posts=100, comments=500, reply_ratio=0.6, reply_depth=3,
+                 link_ratio=0.0, same_thread_ratio=0.0, deleted_ratio=0.0):
+        """
+        Create a user with `posts` submissions and `comments` comments. A `reply_ratio`
+        share of the comments reply to another comment, up to `reply_depth` levels deep.
+        The other ratios add the redundancy of real accounts: link posts without text,
+        comments in a thread (and under a parent) the user already commented in, and
+        deleted or removed comments.
+        """
+        rng = self._rng
+        now = time.time()
+        user_posts = []
+        for i in range(posts):
+            subreddit = rng.choice(SUBREDDITS)
+            post = FakeSubmission(self._new_id(), subreddit, _sentence(rng, 4, 12), _sentence(rng, 0, 120), now - i * 3600)
+            if link_ratio and rng.random() < link_ratio:
+                post.selftext = ""
+                post.url = f"https://example.com/articles/{post.id}"
+            self.things[post.fullname] = post
+            user_posts.append(post)
+
+        user_comments = []
+        for i in range(comments):
+            if user_comments and same_thread_ratio and rng.random() < same_thread_ratio:
+                previous = rng.choice(user_comments[-20:])
+                submission, subreddit, parent_id = self.things[previous.link_id], previous.subreddit, previous.parent_id
+            else:
+                subreddit = rng.choice(SUBREDDITS)
+                # Comments are mostly on other people's posts
+                submission = FakeSubmission(self._new_id(), subreddit, _sentence(rng, 4, 12), "", now - i * 1800)
+                self.things[submission.fullname] = submission
+                parent_id = submission.fullname
+                if rng.random() < reply_ratio:
+                    for _ in range(rng.randint(1, reply_depth)):
+                        parent = FakeComment(self._new_id(), subreddit, _sentence(rng), submission, parent_id, now - i * 1800)
+                        self.things[parent.fullname] = parent
+                        parent_id = parent.fullname
+            comment = FakeComment(self._new_id(), subreddit, _sentence(rng), submission, parent_id, now - i * 1800)
+            if deleted_ratio and rng.random() < deleted_ratio:
+                comment.body = rng.choice(("[deleted]", "[removed]"))
+            self.things[comment.fullname] = comment
+            user_comments.append(comment)
+
+        self.users[name.lower()] = FakeRedditor(
+            name,
+            FakeListing(self.auth, "submissions", user_posts),
+            FakeListing(self.auth, "comments", user_comments),
+        )
+
+    def add_posts(self, name, posts):
+        """
+        Give an existing user `posts` submissions newer than their others.
+        """
+        rng = self._rng
+        now = time.time()
+        new_posts = []
+        for i in range(posts):
+            post = FakeSubmission(self._new_id(), rng.choice(SUBREDDITS), _sentence(rng, 4, 12), _sentence(rng, 0, 120), now + (posts - i) * 60)
+            self.things[post.fullname] = post
+            new_posts.append(post)
+        self.users[name.lower()].submissions.prepend(new_posts)
+
+    def redditor(self, name):
+        # PRAW returns a lazy object without making a request
+        return self.users[name.lower()]
+
+    def info(self, fullnames):
+        self.auth.request("info")
+        return [self.things[fullname] for fullname in fullnames if fullname in self.things]
+
+class FakeFile:
+    def __init__(self, name, size, ready_at):
+        self.name = name
+        self.display_name = name
+        self.uri = f"https://example.invalid/files/{name}"
+        self.size = size
+        self.ready_at = ready_at
+
+    @property
+    def state(self):
+        return types.SimpleNamespace(name="ACTIVE" if time.monotonic() >= self.ready_at else "PROCESSING")
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=len(text) // 4,
+        )
+
+class FakeStreamResponse:
+    """
+    Streamed response: iterating yields one chunk per report section, paced at the
+    client's output speed. Like the real one, text and usage are complete once iterated.
+    """
+
+    def __init__(self, client, text, prompt_tokens):
+        self.client = client
+        self._text = text
+        self._prompt_tokens = prompt_tokens
+        self.text = ""
+        self.usage_metadata = None
+
+    def __iter__(self):
+        time.sleep(self.client.generate_latency)
+        pieces = self._text.split("\n### ")
+        for i, piece in enumerate(pieces):
+            chunk_text = piece if i == 0 else "\n### " + piece
+            if self.client.tokens_per_second:
+                time.sleep(len(chunk_text) / 4 / self.client.tokens_per_second)
+            self.text += chunk_text
+            yield types.SimpleNamespace(text=chunk_text)
+        self.usage_metadata = FakeResponse(self.text, self._prompt_tokens).usage_metadata
+
+REPORT_SECTIONS = (
+    "General Overview", "Personality Traits", "Behavioral Red Flags", "Psychological Insights",
+    "Social Dynamics", "Real-Life Details (Deep Dive)", "Judgment and Prediction", "Detailed Proofs",
+    "Report Structure",
+)
+
+class FakeGemini:
+    """
+    Fake google.generativeai module. Uploaded files stay PROCESSING for `processing_time`
+    seconds; each generation takes `generate_latency` seconds plus the time to emit the
+    report at `tokens_per_second`.
+    """
+
+    def __init__(self, generate_latency=1.0, processing_time=1.0, tokens_per_second=None, report_tokens=2000):
+        self.generate_latency = generate_latency
+        self.processing_time = processing_time
+        self.tokens_per_second = tokens_per_second
+        self.report_tokens = report_tokens
+        self.calls = Counter()
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def _count(self, call):
+        with self._lock:
+            self.calls[call] += 1
+
+    def upload_file(self, path, mime_type=None):
+        self._count("upload_file")
+        with self._lock:
+            name = f"files/{len(self.files) + 1}"
+            file = FakeFile(name, os.path.getsize(path), time.monotonic() + self.processing_time)
+            self.files[name] = file
+        return file
+
+    def get_file(self, name):
+        self._count("get_file")
+        return self.files[name]
+
+    def GenerativeModel(self, model_name=None, generation_config=None):
+        return FakeModel(self)
+
+    def _prompt_tokens(self, parts):
+        tokens = 0
+        for part in parts:
+            if isinstance(part, FakeFile):
+                tokens += part.size // 4
+            elif isinstance(part, dict):
+                tokens += self._prompt_tokens(part.get("parts", []))
+            else:
+                tokens += len(str(part)) // 4
+        return tokens
+
+    def report_text(self, prompt_tokens):
+        section_tokens = max(self.report_tokens // len(REPORT_SECTIONS), 1)
+        filler = " ".join(WORDS[i % len(WORDS)] for i in range(section_tokens))
+        sections = [f"### {i}. **{title}**\n- Based on about {prompt_tokens} input tokens. {filler}\n"
+                    for i, title in enumerate(REPORT_SECTIONS, start=1)]
+        return "\n".join(sections)
+
+    def generation_time(self, text):
+        emit_time = len(text) / 4 / self.tokens_per_second if self.tokens_per_second else 0
+        return self.generate_latency + emit_time
+
+class FakeModel:
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, parts, stream=False):
+        self.client._count("generate_content")
+        prompt_tokens = self.client._prompt_tokens(parts)
+        text = self.client.report_text(prompt_tokens)
+        if stream:
+            return FakeStreamResponse(self.client, text, prompt_tokens)
+        time.sleep(self.client.generation_time(text))
+        return FakeResponse(text, prompt_tokens)
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history or [])
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, message, stream=False):
+        return self.model.generate_content(self.history + [message], stream=stream)
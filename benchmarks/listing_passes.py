@@ -0,0 +1,122 @@
+# benchmarks/listing_passes.py
+
+"""
+Reddit listing requests of the single-pass scrape versus the original
+count-then-refetch approach, against the fake PRAW listings in benchmarks/fakes.py.
+
+    python -m benchmarks.listing_passes --items 100,1000,5000 --latency 0.02
+
+The original scrape walked each listing once to count it with
+sum(1 for _ in listing.new(limit=None)) and a second time to format the items.
+The scraper now pages through each listing once with fetch_listing, counting
+as it goes. Both walks are paged 100 items per request, as PRAW's
+ListingGenerator does. Reports requests and wall time for each approach.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+PAGE_SIZE = 100
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default="100,1000,5000", help="comma-separated posts (and comments) per user")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per Reddit request")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args(argv)
+
+def walk(listing):
+    """
+    Iterate a whole listing the way listing.new(limit=None) does: one request per
+    page of 100, following the last item, until a page comes back empty.
+    """
+    after = None
+    while True:
+        page = list(listing.new(limit=PAGE_SIZE, params={"after": after} if after else {}))
+        if not page:
+            return
+        yield from page
+        after = page[-1].fullname
+
+def count_then_refetch(user, post_record, comment_record):
+    """
+    The original scrape: count both listings, then walk them again for the items.
+    """
+    totals = [sum(1 for _ in walk(listing)) for listing in (user.submissions, user.comments)]
+    posts = [post_record(post) for post in walk(user.submissions)]
+    comments = [comment_record(comment) for comment in walk(user.comments)]
+    return totals, posts, comments
+
+def single_pass(reddit_scraper, user):
+    """
+    The current scrape: one walk per listing with a running count.
+    """
+    counts = {"posts": 0, "comments": 0}
+
+    def count(key):
+        counts[key] += 1
+
+    posts = reddit_scraper.fetch_listing(user.submissions, reddit_scraper.post_record, set(), lambda: count("posts"))
+    comments = reddit_scraper.fetch_listing(user.comments, reddit_scraper.comment_record, set(), lambda: count("comments"))
+    return counts, posts, comments
+
+def measure(reddit, approach):
+    calls_before = sum(reddit.auth.calls.values())
+    start = time.monotonic()
+    _, posts, comments = approach()
+    return {
+        "requests": sum(reddit.auth.calls.values()) - calls_before,
+        "wall_time_s": round(time.monotonic() - start, 3),
+        "items": len(posts) + len(comments),
+    }
+
+def run(args):
+    from benchmarks.fakes import FakeReddit
+
+    workdir = tempfile.mkdtemp(prefix="reddit_listing_benchmark_")
+    os.environ.update({
+        "SCRAPE_CACHE_DIR": os.path.join(workdir, "scrape_cache"),
+        "SCRAPE_CHECKPOINT_DIR": os.path.join(workdir, "scrape_checkpoints"),
+    })
+    import reddit_scraper
+
+    results = []
+    try:
+        for items in (int(count) for count in args.items.split(",")):
+            reddit = FakeReddit(latency=args.latency)
+            reddit.add_user("listing_user", posts=items, comments=items, reply_ratio=0.0)
+            reddit_scraper.set_reddit_client(reddit)
+            user = reddit.redditor("listing_user")
+
+            before = measure(reddit, lambda: count_then_refetch(user, reddit_scraper.post_record, reddit_scraper.comment_record))
+            after = measure(reddit, lambda: single_pass(reddit_scraper, user))
+            results.append({
+                "items_per_listing": items,
+                "count_then_refetch": before,
+                "single_pass": after,
+                "request_ratio": round(after["requests"] / before["requests"], 2),
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print()
+    print(f"{'items':>7}{'before req':>12}{'before s':>10}{'after req':>11}{'after s':>9}{'ratio':>7}")
+    for row in results:
+        before, after = row["count_then_refetch"], row["single_pass"]
+        print(f"{row['items_per_listing']:>7}{before['requests']:>12}{before['wall_time_s']:>10}"
+              f"{after['requests']:>11}{after['wall_time_s']:>9}{row['request_ratio']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# benchmarks/pipeline.py
+
+"""
+End-to-end benchmark of the report pipeline (job queue -> background_task ->
+scraper -> Gemini processor) against the local fakes in benchmarks/fakes.py.
+
+    python -m benchmarks.pipeline --jobs 20 --posts 500 --comments 2000 --reddit-latency 0.05
+
+Reports throughput, p50/p95 job latency, API call counts and peak traced memory.
+With --map-reduce the same jobs run twice, each time in a fresh process: once
+with every report made in a single Gemini call and once with every report made
+by map-reduce over chunks of --chunk-tokens, and both are reported.
+
+    python -m benchmarks.pipeline --map-reduce --chunk-tokens 20000 --gemini-rpm 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# MAP_REDUCE_THRESHOLD_TOKENS of each path compared by --map-reduce
+ANALYSIS_PATHS = {"single_call": 10 ** 12, "map_reduce": 0}
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10, help="reports to generate")
+    parser.add_argument("--users", type=int, default=None, help="distinct Reddit users (default: one per job)")
+    parser.add_argument("--no-coalesce", action="store_true", help="queue a separate job for every submission of the same user")
+    parser.add_argument("--posts", type=int, default=200, help="posts per user")
+    parser.add_argument("--comments", type=int, default=1000, help="comments per user")
+    parser.add_argument("--reply-ratio", type=float, default=0.6, help="share of comments that reply to a comment")
+    parser.add_argument("--reply-depth", type=int, default=3, help="maximum depth of reply chains")
+    parser.add_argument("--link-ratio", type=float, default=0.0, help="share of posts that are link posts without text")
+    parser.add_argument("--same-thread-ratio", type=float, default=0.0, help="share of comments in a thread the user already commented in")
+    parser.add_argument("--deleted-ratio", type=float, default=0.0, help="share of comments that are deleted or removed")
+    parser.add_argument("--no-compact", action="store_true", help="send the plain rendering to Gemini (COMPACT_SCRAPED_DATA=0)")
+    parser.add_argument("--workers", type=int, default=2, help="job worker threads (JOB_WORKERS)")
+    parser.add_argument("--reddit-latency", type=float, default=0.02, help="seconds per Reddit request")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Reddit requests allowed per window")
+    parser.add_argument("--rate-window", type=float, default=600.0, help="Reddit rate-limit window in seconds")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds per Gemini generation")
+    parser.add_argument("--gemini-processing", type=float, default=1.0, help="seconds an uploaded file stays PROCESSING")
+    parser.add_argument("--gemini-tokens-per-second", type=float, default=None, help="simulated output speed")
+    parser.add_argument("--gemini-rpm", type=int, default=None, help="GEMINI_REQUESTS_PER_MINUTE (default: the app's)")
+    parser.add_argument("--map-reduce", action="store_true", help="compare single-call analysis against map-reduce")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="CHUNK_TOKENS of the map-reduce path (default: the app's)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--analysis-path", choices=ANALYSIS_PATHS, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def configure_environment(args, workdir):
+    """
+    Point every setting read at import time at the benchmark's scratch directory.
+    Must run before the app modules are imported.
+    """
+    os.environ.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        "SCRAPE_CACHE_DIR": os.path.join(workdir, "scrape_cache"),
+        "SCRAPE_CHECKPOINT_DIR": os.path.join(workdir, "scrape_checkpoints"),
+        "REPORT_CACHE_DIR": os.path.join(workdir, "report_cache"),
+        "REPORT_STORE_DIR": os.path.join(workdir, "reports"),
+        "JOB_WORKERS": str(args.workers),
+        "JOB_QUEUE_LIMIT": str(args.jobs + 1),
+        "COMPACT_SCRAPED_DATA": "0" if args.no_compact else "1",
+    })
+    if args.gemini_rpm:
+        os.environ["GEMINI_REQUESTS_PER_MINUTE"] = str(args.gemini_rpm)
+    if args.chunk_tokens:
+        os.environ["CHUNK_TOKENS"] = str(args.chunk_tokens)
+    if args.analysis_path:
+        os.environ["MAP_REDUCE_THRESHOLD_TOKENS"] = str(ANALYSIS_PATHS[args.analysis_path])
+
+def run(args):
+    from benchmarks.fakes import FakeReddit, FakeGemini
+
+    workdir = tempfile.mkdtemp(prefix="reddit_gemini_benchmark_")
+    configure_environment(args, workdir)
+
+    import app as webapp
+    import gemini_processor
+    import metrics
+    import reddit_scraper
+    from extensions import db
+
+    users = args.users or args.jobs
+    reddit = FakeReddit(latency=args.reddit_latency, rate_limit=args.rate_limit, window=args.rate_window)
+    for i in range(users):
+        reddit.add_user(
+            f"bench_user_{i}", args.posts, args.comments, args.reply_ratio, args.reply_depth,
+            link_ratio=args.link_ratio, same_thread_ratio=args.same_thread_ratio, deleted_ratio=args.deleted_ratio,
+        )
+    gemini = FakeGemini(
+        generate_latency=args.gemini_latency,
+        processing_time=args.gemini_processing,
+        tokens_per_second=args.gemini_tokens_per_second,
+    )
+    reddit_scraper.set_reddit_client(reddit)
+    gemini_processor.set_gemini_client(gemini)
+    metrics.reset()
+
+    # Record when and how each job finished
+    finished = {}
+    finished_changed = threading.Condition()
+    handler = webapp.job_queue.handler
+
+    def timed_handler(reddit_username, task_id):
+        try:
+            handler(reddit_username, task_id)
+        finally:
+            task = webapp.tasks[task_id]
+            with finished_changed:
+                finished[task_id] = (time.monotonic(), task.get('status'), task.get('timings') or {})
+                finished_changed.notify_all()
+
+    webapp.job_queue.handler = timed_handler
+
+    tracemalloc.start()
+    try:
+        with webapp.app.app_context():
+            db.create_all()
+            start = time.monotonic()
+            submissions = []
+            for i in range(args.jobs):
+                username = f"bench_user_{i % users}"
+                # Same key as app.index(), so repeated users share one job
+                coalesce_key = None if args.no_coalesce else f"{reddit_scraper.normalize_username(username)}:v{gemini_processor.PROMPT_VERSION}"
+                job = webapp.job_queue.submit(username, coalesce_key=coalesce_key)
+                submissions.append((job.id, time.monotonic()))
+        job_ids = {job_id for job_id, _ in submissions}
+        with finished_changed:
+            finished_changed.wait_for(lambda: job_ids <= finished.keys())
+        wall_time = time.monotonic() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        # Let the workers save their final progress before the database is removed
+        while webapp.job_queue.tasks:
+            time.sleep(0.01)
+    finally:
+        tracemalloc.stop()
+
+    latencies = [finished[job_id][0] - submitted_at for job_id, submitted_at in submissions]
+    statuses = [finished[job_id][1] for job_id, _ in submissions]
+    # Time from asking Gemini for the report to the first text (the whole report without streaming)
+    first_content = [timings.get('first_chunk', timings.get('generate'))
+                     for _, _, timings in finished.values() if 'generate' in timings]
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    counters = {}
+    for (name, labels), value in metrics.counter_values().items():
+        label_text = ",".join(f"{key}={value}" for key, value in labels)
+        counters[f"{name}{{{label_text}}}" if label_text else name] = value
+
+    return {
+        "jobs": args.jobs,
+        "distinct_jobs": len(job_ids),
+        "completed": statuses.count("Completed"),
+        "failed": len(statuses) - statuses.count("Completed"),
+        "wall_time_s": round(wall_time, 3),
+        "jobs_per_minute": round(args.jobs / wall_time * 60, 2),
+        "items_per_second": round(args.jobs * (args.posts + args.comments) / wall_time, 1),
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "first_content_p50_s": round(percentile(first_content, 50), 3),
+        "reddit_calls": dict(reddit.auth.calls),
+        "reddit_429s": reddit.auth.rejected,
+        "gemini_calls": dict(gemini.calls),
+        "scraped_bytes": counters.get("scraped_bytes_total", 0),
+        "compaction_saved_chars": counters.get("compaction_saved_chars_total", 0),
+        "gemini_input_tokens": counters.get("gemini_tokens_total{direction=input}", 0),
+        "peak_traced_memory_mb": round(peak_memory / 1024 / 1024, 1),
+        "counters": counters,
+    }
+
+def compare_paths(argv):
+    """
+    Run the benchmark once per analysis path, each in its own process so the
+    Gemini settings are read fresh at import. Returns {path: results}.
+    """
+    child_argv = [arg for arg in argv if arg not in ("--map-reduce", "--json")]
+    results = {}
+    for path in ANALYSIS_PATHS:
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-m", "benchmarks.pipeline", *child_argv, "--json", "--analysis-path", path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout
+        # The scraper prints progress before the results; only they start a line with a bare "{"
+        output = "\n" + output
+        results[path] = json.loads(output[output.rindex("\n{\n") + 1:])
+    return results
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parse_args(argv)
+    if args.map_reduce:
+        results = compare_paths(argv)
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return
+        print()
+        print(f"{'path':<13}{'ok':>5}{'wall s':>9}{'p50 s':>8}{'p95 s':>8}{'gemini calls':>14}{'input tokens':>14}")
+        for path, row in results.items():
+            print(f"{path:<13}{row['completed']:>5}{row['wall_time_s']:>9}{row['latency_p50_s']:>8}{row['latency_p95_s']:>8}"
+                  f"{sum(row['gemini_calls'].values()):>14}{row['gemini_input_tokens']:>14}")
+        return
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print()
+    print(f"Jobs:            {results['completed']}/{results['jobs']} completed, {results['failed']} failed ({results['distinct_jobs']} actually run)")
+    print(f"Wall time:       {results['wall_time_s']}s ({results['jobs_per_minute']} jobs/min, {results['items_per_second']} items/s)")
+    print(f"Job latency:     p50 {results['latency_p50_s']}s, p95 {results['latency_p95_s']}s")
+    print(f"First content:   p50 {results['first_content_p50_s']}s after the generate request")
+    print(f"Reddit calls:    {results['reddit_calls']} (429s: {results['reddit_429s']})")
+    print(f"Gemini calls:    {results['gemini_calls']} ({results['gemini_input_tokens']} input tokens)")
+    print(f"Sent to Gemini:  {results['scraped_bytes']} bytes (compaction removed {results['compaction_saved_chars']} characters)")
+    print(f"Peak memory:     {results['peak_traced_memory_mb']} MB (tracemalloc)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/resolve_parents.py
+
+"""
+Check that parent comments and submissions are resolved in bulk. Scrapes fake
+users of several sizes with the in-process FakeReddit and asserts that the
+scraper makes exactly ceil(unique referenced fullnames / 100) info requests and
+never fetches a comment's parent or submission one at a time.
+
+    python -m benchmarks.resolve_parents --comments 10,250,1000,5000
+
+Exits with status 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+BATCH_SIZE = 100
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", default="10,250,1000,5000", help="comma-separated comment counts of the scraped users")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args(argv)
+
+def referenced_fullnames(reddit, username):
+    """
+    Submissions and parent comments the user's comments refer to, read from the fake.
+    """
+    fullnames = set()
+    for comment in reddit.users[username].comments.items:
+        fullnames.add(comment.link_id)
+        if not comment.is_root:
+            fullnames.add(comment.parent_id)
+    return fullnames
+
+def run(args):
+    from benchmarks.fakes import FakeComment, FakeReddit
+
+    workdir = tempfile.mkdtemp(prefix="reddit_resolve_check_")
+    os.environ.update({
+        "SCRAPE_CACHE_DIR": os.path.join(workdir, "scrape_cache"),
+        "SCRAPE_CHECKPOINT_DIR": os.path.join(workdir, "scrape_checkpoints"),
+        "REDDIT_SCRAPE_ENGINE": "threaded",
+    })
+    import reddit_scraper
+
+    # PRAW fetches lazily through these; the scraper must not touch them
+    single_fetches = []
+    FakeComment.parent = lambda self: single_fetches.append(("parent", self.fullname))
+    FakeComment.submission = property(lambda self: single_fetches.append(("submission", self.fullname)))
+
+    results = []
+    try:
+        for comments in (int(count) for count in args.comments.split(",")):
+            reddit = FakeReddit()
+            username = f"resolve_user_{comments}"
+            reddit.add_user(username, posts=10, comments=comments)
+            reddit_scraper.set_reddit_client(reddit)
+            del single_fetches[:]
+
+            tasks = {username: {}}
+            path = reddit_scraper.scrape_reddit_user(username, username, tasks)
+            if path:
+                os.remove(path)
+
+            unique = len(referenced_fullnames(reddit, username))
+            expected = -(-unique // BATCH_SIZE)
+            results.append({
+                "comments": comments,
+                "referenced_fullnames": unique,
+                "info_calls": reddit.auth.calls["info"],
+                "expected_info_calls": expected,
+                "single_fetches": len(single_fetches),
+                "per_comment_calls": 2 * comments,  # One parent and one submission fetch per comment
+                "ok": path is not None and reddit.auth.calls["info"] == expected and not single_fetches,
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print()
+        print(f"{'comments':>9}{'referenced':>12}{'info calls':>12}{'expected':>10}{'per-comment':>13}{'single':>8}  ok")
+        for row in results:
+            print(f"{row['comments']:>9}{row['referenced_fullnames']:>12}{row['info_calls']:>12}{row['expected_info_calls']:>10}"
+                  f"{row['per_comment_calls']:>13}{row['single_fetches']:>8}  {'yes' if row['ok'] else 'NO'}")
+    if not all(row["ok"] for row in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# benchmarks/resume.py
+
+"""
+Resume check for scrape checkpoints. A scrape runs in a child process against
+the local fake Reddit server and is interrupted partway through the comments
+listing, in one of three ways:
+
+    kill   the process is killed (SIGKILL)
+    fail   a comments page keeps failing until the scraper gives up on it; the
+           scrape must then fail without caching anything
+    evict  the user was scraped and cached before and has new posts since; the
+           comments listing fails, so the posts listing is checkpointed as
+           finished at the first cached post, and the scrape cache entry is
+           evicted before the retry, which must then page on past the new posts
+
+A second child scrapes the same user again. It must continue from the checkpoint,
+refetching at most the pages that were in flight when the first one stopped, and
+produce the same data as a scrape that was never interrupted.
+
+    python -m benchmarks.resume --engine threaded
+    python -m benchmarks.resume --engine async --scenarios fail,evict
+
+Exits with status 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+USERNAME = "resume_user"
+PAGE_SIZE = 100
+NEW_POSTS = 5
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", default="threaded", choices=("threaded", "async"), help="REDDIT_SCRAPE_ENGINE")
+    parser.add_argument("--posts", type=int, default=1000, help="posts of the scraped user")
+    parser.add_argument("--comments", type=int, default=3000, help="comments of the scraped user")
+    parser.add_argument("--scenarios", default="kill,fail,evict", help="comma-separated interruptions to check: kill, fail, evict")
+    parser.add_argument("--kill-after", type=int, default=12, help="comment pages served before the first scrape is interrupted")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the fake server takes per API request")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def scrape_child():
+    """
+    Runs inside a child process: scrape the user once and print the output file's
+    path and whether the scrape cache was written.
+    """
+    import reddit_scraper
+
+    tasks = {"resume": {}}
+    path = reddit_scraper.scrape_reddit_user(USERNAME, "resume", tasks)
+    cache_key = f"{reddit_scraper.normalize_username(USERNAME)}_v{reddit_scraper.SCRAPE_CACHE_VERSION}"
+    print(json.dumps({"path": path, "cached": reddit_scraper.scrape_cache.get(cache_key) is not None}))
+
+def start_child(args, server, workdir, name):
+    env = dict(os.environ)
+    env.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark",
+        "REDDIT_OAUTH_URL": server.url,
+        "REDDIT_URL": server.url,
+        "REDDIT_SCRAPE_ENGINE": args.engine,
+        "SCRAPE_CACHE_DIR": os.path.join(workdir, name, "scrape_cache"),
+        "SCRAPE_CHECKPOINT_DIR": os.path.join(workdir, name, "checkpoints"),
+        "SCRAPE_CHECKPOINT_INTERVAL": "0",  # Save after every page
+        "REDDIT_RETRY_BACKOFF": "0",  # Give up on a failing page without waiting
+    })
+    return subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.resume", "--child"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+
+def finish_child(process, reddit):
+    """
+    Wait for a child scrape and return (output file contents or None, whether it
+    wrote the scrape cache, listing pages it requested).
+    """
+    before = listing_pages(reddit)
+    output, _ = process.communicate(timeout=300)
+    result = json.loads(output.strip().splitlines()[-1])
+    content = None
+    if result["path"] is not None:
+        with open(result["path"], encoding="utf-8") as f:
+            content = f.read()
+        os.remove(result["path"])
+    return content, result["cached"], listing_pages(reddit) - before
+
+def listing_pages(reddit):
+    return reddit.auth.calls["submissions"] + reddit.auth.calls["comments"]
+
+def prepare_eviction(args, server, reddit, workdir):
+    """
+    Cache a complete scrape of the user in the evict scenario's directory, then give
+    the user newer posts. Returns the output and listing pages of an uninterrupted
+    scrape of the updated user.
+    """
+    finish_child(start_child(args, server, workdir, "evict"), reddit)
+    reddit.add_posts(USERNAME, NEW_POSTS)
+    expected, _, clean_pages = finish_child(start_child(args, server, workdir, "evict_clean"), reddit)
+    return expected, clean_pages
+
+def interrupt(args, server, reddit, workdir, scenario):
+    """
+    Start a scrape and stop it partway through the comments. Returns True if the
+    interrupted scrape neither finished nor wrote the scrape cache.
+    """
+    kill_at = reddit.auth.calls["comments"] + args.kill_after
+    if scenario == "evict":
+        # Fail from the first comments page; the posts listing stops at the cached posts
+        server.fail_listing("comments", reddit.auth.calls["comments"], 10 ** 6)
+        content, _, _ = finish_child(start_child(args, server, workdir, scenario), reddit)
+        server.failures.clear()
+        # The cache entry the posts listing stopped at is gone by the time of the retry
+        shutil.rmtree(os.path.join(workdir, scenario, "scrape_cache"))
+        return content is None
+    if scenario == "fail":
+        # Keep failing until the scrape has ended: the clients retry on their own as well
+        server.fail_listing("comments", kill_at, 10 ** 6)
+        _, cached, _ = finish_child(start_child(args, server, workdir, scenario), reddit)
+        server.failures.clear()
+        return not cached
+
+    first = start_child(args, server, workdir, scenario)
+    while reddit.auth.calls["comments"] < kill_at:
+        if first.poll() is not None:
+            raise RuntimeError("the first scrape finished before it could be killed; lower --kill-after")
+        time.sleep(0.001)
+    first.kill()
+    first.wait()
+    return True
+
+def run(args):
+    from benchmarks.fakes import FakeReddit
+    from benchmarks.fake_reddit_server import FakeRedditServer
+
+    reddit = FakeReddit()
+    reddit.add_user(USERNAME, args.posts, args.comments)
+    server = FakeRedditServer(reddit, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix="reddit_resume_check_")
+    results = []
+    try:
+        # Reference: a scrape that is never interrupted
+        expected, _, clean_pages = finish_child(start_child(args, server, workdir, "clean"), reddit)
+
+        for scenario in args.scenarios.split(","):
+            if scenario == "evict":
+                expected, clean_pages = prepare_eviction(args, server, reddit, workdir)
+            user = reddit.users[USERNAME]
+            # Every listing ends with a request that returns an empty page
+            total_pages = -(-len(user.submissions.items) // PAGE_SIZE) + 1 + -(-len(user.comments.items) // PAGE_SIZE) + 1
+            start = listing_pages(reddit)
+            nothing_cached = interrupt(args, server, reddit, workdir, scenario)
+            pages_before = listing_pages(reddit) - start
+
+            # Scrape again with the same checkpoint directory
+            resumed, _, resumed_pages = finish_child(start_child(args, server, workdir, scenario), reddit)
+
+            # At most one page per listing can have been in flight when the scrape stopped
+            allowed_pages = clean_pages - pages_before + 2
+            results.append({
+                "scenario": scenario,
+                "engine": args.engine,
+                "listing_pages": clean_pages,
+                "pages_before_interruption": pages_before,
+                "pages_after_resume": resumed_pages,
+                "pages_refetched": resumed_pages + pages_before - clean_pages,
+                "nothing_cached": nothing_cached,
+                "resumed": resumed_pages <= allowed_pages and resumed_pages < total_pages,
+                "identical_output": resumed == expected,
+            })
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        scrape_child()
+        return
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(f"Scenario:           {result['scenario']} ({result['engine']} engine)")
+            print(f"Listing pages:      {result['listing_pages']} for an uninterrupted scrape")
+            print(f"Before stopping:    {result['pages_before_interruption']} pages")
+            print(f"After resuming:     {result['pages_after_resume']} pages ({result['pages_refetched']} fetched twice)")
+            print(f"Nothing cached:     {'yes' if result['nothing_cached'] else 'NO'}")
+            print(f"Resumed:            {'yes' if result['resumed'] else 'NO'}")
+            print(f"Identical output:   {'yes' if result['identical_output'] else 'NO'}")
+            print()
+    if not all(result["nothing_cached"] and result["resumed"] and result["identical_output"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/scrape_engines.py
+
+"""
+Threaded (PRAW) versus async (asyncpraw) scraping engine, at several numbers of
+concurrent jobs, against the local fake Reddit server in benchmarks/fake_reddit_server.py.
+
+    python -m benchmarks.scrape_engines --concurrency 1,10,100 --latency 0.05
+
+Each job runs scrape_reddit_user for a different user in its own thread, as the job
+workers do. Reports wall time, throughput, per-job latency, peak thread count and
+Reddit requests per engine and concurrency level.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ENGINES = ("threaded", "async")
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,10,100", help="comma-separated numbers of concurrent jobs")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma-separated engines to compare")
+    parser.add_argument("--posts", type=int, default=150, help="posts per user")
+    parser.add_argument("--comments", type=int, default=450, help="comments per user")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake server takes per API request")
+    parser.add_argument("--connections", type=int, default=None, help="REDDIT_ASYNC_CONNECTIONS for the async engine")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args(argv)
+
+class ThreadSampler:
+    """
+    Records the peak number of live threads while running.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_level(reddit_scraper, reddit, engine, jobs, cache_dir):
+    """
+    Scrape `jobs` users concurrently with one engine and return the measurements.
+    """
+    reddit_scraper.SCRAPE_ENGINE = engine
+    # Start from an empty scrape cache so every level scrapes everything
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    calls_before = sum(reddit.auth.calls.values())
+    tasks = {i: {} for i in range(jobs)}
+
+    def run_job(i):
+        start = time.monotonic()
+        path = reddit_scraper.scrape_reddit_user(f"bench_user_{i}", i, tasks)
+        elapsed = time.monotonic() - start
+        if path:
+            os.remove(path)
+        return elapsed, path is not None
+
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=jobs) as pool:
+        start = time.monotonic()
+        results = list(pool.map(run_job, range(jobs)))
+        wall_time = time.monotonic() - start
+
+    latencies = [elapsed for elapsed, _ in results]
+    items = sum(task.get('scraped_posts', 0) + task.get('scraped_comments', 0) for task in tasks.values())
+    return {
+        "engine": engine,
+        "jobs": jobs,
+        "succeeded": sum(ok for _, ok in results),
+        "wall_time_s": round(wall_time, 3),
+        "items_per_second": round(items / wall_time, 1),
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "peak_threads": sampler.peak,
+        "reddit_requests": sum(reddit.auth.calls.values()) - calls_before,
+    }
+
+def run(args):
+    from benchmarks.fakes import FakeReddit
+    from benchmarks.fake_reddit_server import FakeRedditServer
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    engines = [engine.strip() for engine in args.engines.split(",")]
+    reddit = FakeReddit()
+    for i in range(max(levels)):
+        reddit.add_user(f"bench_user_{i}", args.posts, args.comments)
+    server = FakeRedditServer(reddit, latency=args.latency).start()
+
+    workdir = tempfile.mkdtemp(prefix="reddit_engine_benchmark_")
+    cache_dir = os.path.join(workdir, "scrape_cache")
+    os.environ.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark",
+        "REDDIT_OAUTH_URL": server.url,
+        "REDDIT_URL": server.url,
+        "SCRAPE_CACHE_DIR": cache_dir,
+        "SCRAPE_CHECKPOINT_DIR": os.path.join(workdir, "scrape_checkpoints"),
+    })
+    if args.connections:
+        os.environ["REDDIT_ASYNC_CONNECTIONS"] = str(args.connections)
+    import reddit_scraper
+
+    results = []
+    try:
+        for engine in engines:
+            # Warm up: create the client and get an access token outside the measurements
+            run_level(reddit_scraper, reddit, engine, 1, cache_dir)
+            for jobs in levels:
+                results.append(run_level(reddit_scraper, reddit, engine, jobs, cache_dir))
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print()
+    print(f"{'engine':<10}{'jobs':>6}{'ok':>6}{'wall s':>9}{'items/s':>10}{'p50 s':>8}{'p95 s':>8}{'threads':>9}{'requests':>10}")
+    for row in results:
+        print(f"{row['engine']:<10}{row['jobs']:>6}{row['succeeded']:>6}{row['wall_time_s']:>9}{row['items_per_second']:>10}"
+              f"{row['latency_p50_s']:>8}{row['latency_p95_s']:>8}{row['peak_threads']:>9}{row['reddit_requests']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/startup.py
+
+"""
+Startup benchmark: how long a fresh worker process takes to import the app and
+serve its first request, and what the first job pays to create the API clients.
+
+    python -m benchmarks.startup --runs 5
+
+Every run is a new Python process, so nothing is shared through sys.modules.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("praw", "prawcore", "google.generativeai")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to start")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def measure_child():
+    """
+    Runs inside the fresh process: time the app import, the first request and the
+    lazy client creation, and print the numbers as JSON.
+    """
+    start = time.perf_counter()
+    import app as webapp
+    import_time = time.perf_counter() - start
+    loaded_on_import = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    from extensions import db
+    with webapp.app.app_context():
+        db.create_all()
+
+    # The first request also starts the job workers (before_request hook)
+    start = time.perf_counter()
+    response = webapp.app.test_client().get("/login")
+    first_response_time = time.perf_counter() - start
+    loaded_after_request = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    import gemini_processor
+    import reddit_scraper
+    start = time.perf_counter()
+    reddit_scraper.get_reddit_client()
+    gemini_processor.get_gemini_client()
+    client_time = time.perf_counter() - start
+
+    print(json.dumps({
+        "status_code": response.status_code,
+        "import_s": import_time,
+        "first_response_s": first_response_time,
+        "client_init_s": client_time,
+        "loaded_on_import": loaded_on_import,
+        "loaded_after_first_request": loaded_after_request,
+    }))
+
+def run_once():
+    workdir = tempfile.mkdtemp(prefix="reddit_gemini_startup_")
+    env = dict(os.environ)
+    env.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        "JOB_WORKERS": "1",
+    })
+    try:
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-m", "benchmarks.startup", "--child"],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        process_time = time.perf_counter() - start
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    # The app prints while starting; the measurements are the last line
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = process_time
+    return result
+
+def run(args):
+    samples = [run_once() for _ in range(args.runs)]
+    results = {"runs": args.runs}
+    for key in ("import_s", "first_response_s", "client_init_s", "process_s"):
+        values = [sample[key] for sample in samples]
+        results[key] = {"median": round(statistics.median(values), 3), "min": round(min(values), 3)}
+    results["status_code"] = samples[-1]["status_code"]
+    results["loaded_on_import"] = samples[-1]["loaded_on_import"]
+    results["loaded_after_first_request"] = samples[-1]["loaded_after_first_request"]
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        measure_child()
+        return
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    def timing(key):
+        return f"median {results[key]['median']}s, min {results[key]['min']}s"
+
+    print(f"Runs:                 {results['runs']} fresh processes")
+    print(f"import app:           {timing('import_s')}")
+    print(f"First response:       {timing('first_response_s')} (GET /login -> {results['status_code']})")
+    print(f"Process total:        {timing('process_s')} (interpreter start to exit)")
+    print(f"Client creation:      {timing('client_init_s')} (paid by the first job)")
+    print(f"Loaded on import:     {', '.join(results['loaded_on_import']) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+    print(f"Loaded after request: {', '.join(results['loaded_after_first_request']) or 'none'}")
+
+if __name__ == "__main__":
+    main()
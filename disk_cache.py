@@ -0,0 +1,123 @@
+# disk_cache.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+class DiskCache:
+    """
+    Directory of JSON entries with a TTL and size-based LRU eviction.
+    Entries are written atomically, so several processes can share one directory.
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self, directory, ttl, max_bytes):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        safe_key = "".join(c for c in key if c.isalnum() or c in "_-")
+        return os.path.join(self.directory, f"{safe_key}.json")
+
+    def get(self, key):
+        """
+        Return the value stored under key, or None if it is missing or older than the TTL.
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            expired = time.time() - entry.get("stored_at", 0) > self.ttl
+            try:
+                if expired:
+                    os.remove(path)
+                else:
+                    # Touch the file so eviction drops the least recently used entries first
+                    os.utime(path)
+            except OSError:
+                pass
+
+            if expired:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value and evict old entries if the cache is too large.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"stored_at": time.time(), "value": value}
+        with self._lock:
+            # Write to a temp file first so readers never see a half-written entry
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self._path(key))
+            self._evict()
+
+    def delete(self, key):
+        """
+        Remove the entry stored under key, if any.
+        """
+        with self._lock:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Hit/miss counters and current size of the cache.
+        """
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        """
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
@@ -23,7 +23,7 @@ class RegistrationForm(FlaskForm):
             raise ValidationError('That username is taken. Please choose a different one.')
 
     def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
+        user = User.find_by_email(email.data)
         if user:
             raise ValidationError('That email is already registered. Please choose a different one.')
 
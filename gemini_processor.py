@@ -2,84 +2,420 @@
 
 import os
 import time
-import google.generativeai as genai
+import json
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import uuid
 import tempfile
+from disk_cache import DiskCache
+import metrics
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Client used for all Gemini calls: the google.generativeai module unless replaced.
+# It is imported and configured on first use, since importing it takes about a second
+# and web workers that only serve pages never need it.
+_gemini_client = None
+_gemini_client_lock = threading.Lock()
+
+def get_gemini_client():
+    """
+    Return the Gemini client, importing and configuring google.generativeai on the first call.
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _gemini_client = genai
+    return _gemini_client
+
+def set_gemini_client(client):
+    """
+    Replace the Gemini client, e.g. with a local stand-in for benchmarks.
+    The client needs the google.generativeai functions used here:
+    upload_file(), get_file() and GenerativeModel.
+    """
+    global _gemini_client
+    with _gemini_client_lock:
+        _gemini_client = client
+
+MODEL_NAME = "gemini-exp-1206"  # Replace with actual model name if different
+
+GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 64,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+
+# Bump whenever ANALYSIS_PROMPT changes so cached reports from the old prompt are not reused
+PROMPT_VERSION = 1
+
+ANALYSIS_PROMPT = "You are an advanced AI linguist, psychologist, and behavior analyst trained to analyze digital personas. The attached file contains publicly scraped data of a Reddit account, including their posts and comments. Your task is to create a highly detailed and objective report analyzing the personality, behavior, and potential real-life characteristics of the individual behind this account. Be thorough, no sugarcoating, and support every conclusion with evidence from their posts or comments. You have to be in detail as much as possible breakdown everything. The analysis should be structured as follows:\n\n### 1. **General Overview**\n   - Summarize their overall Reddit activity.\n   - Identify the primary subreddits they engage with and their interaction patterns.\n   - Highlight any notable quirks or unique behaviors.\n\n### 2. **Personality Traits**\n   - Writing Style:\n     - Do they use a lot of slang, swear words, or formal language?\n     - Are they concise or verbose? How articulate are they?\n   - Emotional Tone:\n     - Do they appear sarcastic, angry, empathetic, or neutral or what?\n     - Identify recurring emotional patterns (e.g., consistent frustration, humor, kindness, etc).\n   - Recurring Themes:\n     - What topics are they obsessed with (e.g., tech, politics, cats)?\n     - Any peculiar or niche interests that stand out?\n\n### 3. **Behavioral Red Flags**\n   - Problematic Behavior:\n     - Are there indications of toxic traits (e.g., misogyny, racism, trolling etc)?\n     - Provide evidence from specific posts/comments.\n   - Controversial Topics:\n     - Have they engaged in heated debates or controversial discussions? If so, which ones?\n   - Ethical Concerns:\n     - Any signs of stalking, harassment, or unethical behavior? Cite examples.\n\n### 4. **Psychological Insights**\n   - Infer potential personality disorders or quirks based on their patterns (e.g., narcissism, obsessive tendencies, etc).\n   - Are there signs of insecurity, overconfidence, or attention-seeking behavior or any other similar?\n   - Any traits that suggest leadership qualities, creativity, or empathy?\n\n### 5. **Social Dynamics**\n   - Interaction Style:\n     - Do they seek validation? Argue a lot? Or mostly observe?\n     - How do they respond to criticism—defensive, open-minded, dismissive?\n   - Relationship Indicators:\n     - Can you infer how they might interact with friends, colleagues, or family based on their tone and topics?\n\n### 6. **Real-Life Details (Deep Dive)**\n   - **Personal Information Extraction**:\n     - Extract any real-life details the user may have inadvertently shared (e.g., full name, location, city, state, country).\n     - Did they mention where they live or any specific places related to them (e.g., city, neighborhood)?\n   - **Family and Relationships**:\n     - If the user shared any information about their family (e.g., parents, siblings, children), include it.\n     - Look for any references to close relationships or social groups (e.g., friends, colleagues, romantic partners).\n     - Note if they referenced any personal struggles, relationships with family, or any other intimate details they’ve discussed.\n   - **Detailed Analysis of Real-Life Connections**:\n     - Does the person mention any specific events or people in their personal life? (E.g., family holidays, relationships, problems with peers, etc.)\n     - What can be inferred about their social circles or living environment based on the information shared?\n\n### 7. **Judgment and Prediction**\n   - Is this person likely a positive or negative influence in real life? Why?\n   - What kind of individual might they be in real-world settings (e.g., introvert, extrovert, leader, loner)?\n   - Predict their personality in real life with evidence-backed reasoning.\n\n### 8. **Detailed Proofs**\n   - For every conclusion you make, cite specific posts, comments, or patterns from the data. Use quotes or direct references for clarity.\n   - Example: \n     - \"The user exhibits signs of trolling. In [this comment](https://reddit.com/comment_id), they mocked someone’s opinion without adding value.\"\n     - \"Evidence of recurring sarcasm: 'Yeah, sure, because *that’s* going to solve the world’s problems' [Post in r/sarcasm].\"\n     - \"Signs of toxic masculinity in [this post](https://reddit.com/post_id): 'Women these days just want...'\"\n\n### 9. **Report Structure**\n   - **Concise Headings:** Use bullet points, headers, and sub-headers for readability.\n   - **Language Style:** Be sharp, direct, and unapologetic, as if preparing a psychological profile for an investigation. \n   - **Tone:** Maintain professionalism, but don’t shy away from brutally honest insights.\n\n### Example Outputs:\n- *\"Bro, you're essentially Reddit's poster child for trolling. Here’s the proof: [links to comments]. Your obsession with debating flat-earthers in r/science suggests an inferiority complex and a need to assert intellectual dominance.\"*\n- *\"Based on [this post](https://reddit.com/post_id) in r/MGTOW, your comments reveal a pattern of misogynistic tendencies and anger issues. This is consistent across multiple threads.\"*\n- *\"You’ve replied 'LOL cringe' to 37 people in r/memes. This indicates dismissive behavior and likely a lack of constructive engagement in real life.\"*\n\nFinally, ensure your report is brutally honest, free of bias, and as comprehensive as possible.\n"
+
+# Accounts whose scraped data is estimated above this many tokens are analyzed with map-reduce
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS") or 500000)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS") or 100000)  # Token budget per map chunk
+MAP_WORKERS = int(os.getenv("MAP_WORKERS") or 4)  # Chunks analyzed concurrently per job
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE") or 10)  # Shared by all jobs in this process
+INLINE_CONTENT_MAX_BYTES = int(os.getenv("INLINE_CONTENT_MAX_BYTES") or 1024 * 1024)  # Smaller content is sent inline instead of uploaded
+# Stream the report and write it to the report file as it is generated (set to 0 to wait for the whole response)
+STREAM_REPORT = (os.getenv("GEMINI_STREAM_REPORT") or "1") != "0"
+
+CHUNK_PROMPT = "You are an advanced AI linguist, psychologist, and behavior analyst trained to analyze digital personas. The text below is one part of the publicly scraped posts and comments of a single Reddit account. Extract detailed findings about the person behind it: subreddits and activity patterns, writing style, emotional tone, recurring themes, behavioral red flags, psychological traits, social dynamics, and any real-life details they shared (location, family, relationships, events). Quote the specific posts and comments that support every finding, because your findings will be merged with findings from the other parts into one final report. Be thorough and objective, and do not write the final report yet.\n"
+
+REDUCE_PROMPT = "The account's data was too large to analyze at once, so it was split into parts. Instead of the raw data, you are given the findings extracted from each part, with quoted evidence. Merge them into one report: combine duplicate findings, resolve contradictions, weigh patterns that appear across many parts more heavily, and keep the quoted evidence. Treat the findings as the attached file in the instructions below.\n\n" + ANALYSIS_PROMPT
+
+# Generated reports keyed by content hash, model, generation config and prompt version
+report_cache = DiskCache(
+    os.getenv("REPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "gemini_report_cache"),
+    ttl=int(os.getenv("REPORT_CACHE_TTL") or 7 * 24 * 60 * 60),
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_MB") or 200) * 1024 * 1024,
+)
+
+def report_cache_key(content_path):
+    """
+    Cache key for the report generated from the content file with the current model settings.
+    """
+    content_hash = hashlib.sha256()
+    with open(content_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(block)
+    settings = json.dumps({
+        "content_sha256": content_hash.hexdigest(),
+        "model": MODEL_NAME,
+        "generation_config": GENERATION_CONFIG,
+        "prompt_version": PROMPT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+def new_report_path(username):
+    """
+    Unique path for a report file in the temp directory.
+    """
+    output_filename = f"response_output_{username}_{uuid.uuid4().hex}.md"
+    return os.path.join(tempfile.gettempdir(), output_filename)
+
+def save_report(username, report_text, task_id, tasks):
+    """
+    Write a report to a unique .md file and record its path in the task.
+    """
+    output_path = new_report_path(username)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(report_text)
+
+    print(f"Response saved to {output_path}")
+    tasks[task_id]['report_path'] = output_path
+    return output_path
+
+class RateLimiter:
+    """
+    Allow at most `rate` calls per `period` seconds, shared across threads.
+    """
+
+    def __init__(self, rate, period=60.0):
+        self.rate = rate
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a call is allowed, then record it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.rate:
+                    self._calls.append(now)
+                    return
+                wait_time = self.period - (now - self._calls[0])
+            time.sleep(wait_time)
+
+gemini_rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+
+def record_usage(response, call):
+    """
+    Count a generation call and the tokens it used.
+    """
+    metrics.inc("gemini_api_calls_total", help_text="Gemini API requests made.", call=call)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        metrics.inc("gemini_tokens_total", getattr(usage, "prompt_token_count", 0) or 0, help_text="Gemini tokens used.", direction="input")
+        metrics.inc("gemini_tokens_total", getattr(usage, "candidates_token_count", 0) or 0, direction="output")
+
+def create_model():
+    """
+    Create the Gemini model used for analysis.
+    """
+    return get_gemini_client().GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config=GENERATION_CONFIG,
+    )
+
+def estimate_tokens(text):
+    """
+    Rough token count for English text (about four characters per token).
+    """
+    return len(text) // 4 + 1
+
+def split_into_chunks(lines, chunk_tokens=CHUNK_TOKENS):
+    """
+    Split scraped markdown (an iterable of lines, e.g. an open file) into chunks
+    of roughly `chunk_tokens` tokens. Posts and comments are grouped by subreddit
+    so each chunk covers related activity; within a subreddit they keep their order.
+    Understands both the plain format, where every item names its subreddit, and
+    the compacted one, where items are "### " threads under "## r/<subreddit>"
+    sections; there each chunk repeats the section headings it needs and the note
+    that explains the format, and threads too large for one chunk are split
+    between their entries.
+    """
+    title = ""
+    preamble = []
+    section = None
+    items = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not title:
+            title = line
+        elif line.startswith("### "):
+            items.append((section, [line]))
+        elif line.startswith("## "):  # Section headers are not carried into chunks as such
+            section = line[len("## "):] if line.startswith("## r/") else None
+        elif items:
+            items[-1][1].append(line)
+        elif line:
+            preamble.append(line)
+
+    max_chars = chunk_tokens * 4
+    grouped = {}
+    for section, lines in items:
+        subreddit = section or next((line[len("**Subreddit:** "):] for line in lines if line.startswith("**Subreddit:** ")), "")
+        text = "\n".join(lines).strip() + "\n\n"
+        for part in split_item(text, max_chars) if section else [text[:max_chars]]:
+            grouped.setdefault(subreddit, []).append((section, part))
+
+    chunks = []
+    current = []
+    current_chars = 0
+    for subreddit, items in grouped.items():
+        current_section = None
+        for section, item in items:
+            if current and current_chars + len(item) > max_chars:
+                chunks.append("".join(current))
+                current = []
+                current_chars = 0
+                current_section = None
+            if section and section != current_section:
+                current.append(f"## {section}\n\n")
+                current_section = section
+            current.append(item)
+            current_chars += len(item)
+    if current:
+        chunks.append("".join(current))
+
+    intro = "\n".join(preamble) + "\n\n" if preamble else ""
+    return [f"{title} (part {i} of {len(chunks)})\n\n{intro}{chunk}" for i, chunk in enumerate(chunks, start=1)]
+
+def split_item(text, max_chars):
+    """
+    Split a compacted thread at its blank-line separated entries into parts of at
+    most `max_chars`, each starting with the thread heading.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    heading, _, rest = text.partition("\n")
+    parts = []
+    part = heading + "\n"
+    for entry in rest.strip().split("\n\n"):
+        entry = entry[:max_chars - len(heading) - 3] + "\n\n"
+        if len(part) + len(entry) > max_chars and part != heading + "\n":
+            parts.append(part.rstrip("\n") + "\n\n")
+            part = heading + "\n"
+        part += entry
+    parts.append(part.rstrip("\n") + "\n\n")
+    return parts
+
+def map_reduce_analysis(content_path, task_id, tasks):
+    """
+    Analyze content that is too large for one call: extract findings from each chunk
+    concurrently, then merge them into the final report. Returns the report text.
+    """
+    with open(content_path, "r", encoding="utf-8") as f:
+        chunks = split_into_chunks(f)
+    model = create_model()
+    tasks[task_id]['progress'] = f'Analyzing data in {len(chunks)} parts...'
+
+    def analyze_chunk(chunk):
+        gemini_rate_limiter.acquire()
+        response = model.generate_content([CHUNK_PROMPT, chunk])
+        record_usage(response, "map")
+        return response.text
+
+    findings = [None] * len(chunks)
+    with metrics.timed('map', tasks[task_id]), ThreadPoolExecutor(max_workers=MAP_WORKERS) as pool:
+        futures = {pool.submit(analyze_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            findings[futures[future]] = future.result()
+            tasks[task_id]['progress'] = f'Analyzed {done}/{len(chunks)} parts...'
+
+    tasks[task_id]['progress'] = 'Merging findings into the final report...'
+    merged_findings = "\n\n".join(
+        f"## Findings from part {i} of {len(findings)}\n\n{text}" for i, text in enumerate(findings, start=1)
+    )
+    gemini_rate_limiter.acquire()
+    with metrics.timed('reduce', tasks[task_id]):
+        response = model.generate_content([REDUCE_PROMPT, merged_findings])
+    record_usage(response, "reduce")
+    return response.text
 
 def upload_to_gemini(path, mime_type=None):
     """
     Upload a file to Gemini API.
     """
     try:
-        file = genai.upload_file(path, mime_type=mime_type)
+        metrics.inc("gemini_api_calls_total", help_text="Gemini API requests made.", call="upload")
+        file = get_gemini_client().upload_file(path, mime_type=mime_type)
+        metrics.inc("gemini_upload_bytes_total", os.path.getsize(path), help_text="Bytes uploaded to Gemini.")
         print(f"Uploaded file '{file.display_name}' as: {file.uri}")
         return file
     except Exception as e:
         print(f"Error uploading file to Gemini API: {e}")
         return None
 
-def wait_for_files_active(files):
+def wait_for_file_active(name, deadline, initial_delay=0.5, max_delay=10.0):
+    """
+    Poll one uploaded file with exponential backoff until it leaves the PROCESSING state.
     """
-    Wait until all uploaded files are in ACTIVE state.
+    delay = initial_delay
+    metrics.inc("gemini_api_calls_total", help_text="Gemini API requests made.", call="get_file")
+    file = get_gemini_client().get_file(name)
+    while file.state.name == "PROCESSING":
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"File {name} was still processing at the deadline")
+        print(".", end="", flush=True)
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+        metrics.inc("gemini_api_calls_total", call="get_file")
+        file = get_gemini_client().get_file(name)
+    if file.state.name != "ACTIVE":
+        raise Exception(f"File {file.name} failed to process")
+
+def wait_for_files_active(files, timeout=600):
+    """
+    Wait until all uploaded files are in ACTIVE state, checking them concurrently.
+    Returns the number of seconds spent waiting.
     """
     print("Waiting for file processing...")
-    for name in (file.name for file in files):
-        file = genai.get_file(name)
-        while file.state.name == "PROCESSING":
-            print(".", end="", flush=True)
-            time.sleep(10)
-            file = genai.get_file(name)
-        if file.state.name != "ACTIVE":
-            raise Exception(f"File {file.name} failed to process")
-    print("...all files ready\n")
+    start = time.monotonic()
+    deadline = start + timeout
+    with ThreadPoolExecutor(max_workers=max(len(files), 1)) as pool:
+        futures = [pool.submit(wait_for_file_active, file.name, deadline) for file in files]
+        for future in futures:
+            future.result()
+    elapsed = time.monotonic() - start
+    print(f"...all files ready in {elapsed:.1f}s\n")
+    return elapsed
 
-def process_content(username, content, task_id, tasks):
+def stream_report(username, response, task_id, tasks):
     """
-    Process the scraped content through Gemini API and update the tasks dict with progress.
+    Write a streamed Gemini response to a new report file chunk by chunk.
+    The file path is set in the task before the first chunk, so the progress page
+    can show the partial report, and 'generated_tokens' is updated as chunks arrive.
+    Returns the report text.
     """
+    output_path = new_report_path(username)
+    tasks[task_id]['report_path'] = output_path
+    tasks[task_id]['generated_tokens'] = 0
+    pieces = []
+    chunks = iter(response)
     try:
-        generation_config = {
-            "temperature": 1,
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-        }
+        with open(output_path, "w", encoding="utf-8") as f:
+            with metrics.timed('first_chunk', tasks[task_id]):
+                chunk = next(chunks, None)
+            while chunk is not None:
+                f.write(chunk.text)
+                f.flush()  # Make the chunk visible to the progress page
+                pieces.append(chunk.text)
+                tasks[task_id]['generated_tokens'] += estimate_tokens(chunk.text)
+                tasks[task_id]['progress'] = f"Generating analysis report... ({tasks[task_id]['generated_tokens']} tokens)"
+                chunk = next(chunks, None)
+    except Exception:
+        tasks[task_id]['report_path'] = None
+        os.remove(output_path)
+        raise
 
-        tasks[task_id]['progress'] = 'Initializing Gemini model...'
-        model = genai.GenerativeModel(
-            model_name="gemini-exp-1206",  # Replace with actual model name if different
-            generation_config=generation_config,
-        )
+    print(f"Response streamed to {output_path}")
+    return "".join(pieces)
 
-        # Create a unique temporary file
-        temp_dir = tempfile.gettempdir()
-        unique_id = uuid.uuid4().hex
-        temp_input_file = os.path.join(temp_dir, f"{username}_{unique_id}_reddit_full_data.md")
+def process_content(username, content_path, task_id, tasks):
+    """
+    Process the scraped content file through Gemini API and update the tasks dict with progress.
+    """
+    try:
+        content_size = os.path.getsize(content_path)
 
-        # Write content to the temporary input file
-        with open(temp_input_file, "w", encoding="utf-8") as f:
-            f.write(content)
+        # Identical content analyzed with the same model, config and prompt gives an equivalent report
+        cache_key = report_cache_key(content_path)
+        cached_report = report_cache.get(cache_key)
+        if cached_report is not None:
+            print(f"Report cache hit for {username}")
+            return save_report(username, cached_report, task_id, tasks)
 
-        tasks[task_id]['progress'] = 'Uploading file to Gemini API...'
-        # Upload the file
-        uploaded_file = upload_to_gemini(temp_input_file, mime_type="text/markdown")
-        if not uploaded_file:
-            tasks[task_id]['status'] = 'Failed'
-            tasks[task_id]['progress'] = 'Failed to upload file to Gemini API.'
-            os.remove(temp_input_file)  # Clean up
-            return None
+        # Bytes approximate characters closely enough for the token estimate
+        if content_size // 4 > MAP_REDUCE_THRESHOLD_TOKENS:
+            try:
+                report_text = map_reduce_analysis(content_path, task_id, tasks)
+            except Exception as e:
+                print(f"Error during map-reduce analysis: {e}")
+                tasks[task_id]['progress'] = 'Failed during Gemini processing.'
+                tasks[task_id]['status'] = 'Failed'
+                return None
+            report_cache.set(cache_key, report_text)
+            return save_report(username, report_text, task_id, tasks)
+
+        tasks[task_id]['progress'] = 'Initializing Gemini model...'
+        model = create_model()
+
+        if content_size <= INLINE_CONTENT_MAX_BYTES:
+            # Small enough to send with the prompt, so skip the upload and the processing wait
+            with open(content_path, "r", encoding="utf-8") as f:
+                content_part = f.read()
+        else:
+            tasks[task_id]['progress'] = 'Uploading file to Gemini API...'
+            # Upload the file
+            with metrics.timed('upload', tasks[task_id]):
+                uploaded_file = upload_to_gemini(content_path, mime_type="text/markdown")
+            if not uploaded_file:
+                tasks[task_id]['status'] = 'Failed'
+                tasks[task_id]['progress'] = 'Failed to upload file to Gemini API.'
+                return None
 
-        tasks[task_id]['progress'] = 'Waiting for Gemini to process the file...'
-        # Wait for the file to be active
-        wait_for_files_active([uploaded_file])
+            tasks[task_id]['progress'] = 'Waiting for Gemini to process the file...'
+            # Wait for the file to be active
+            try:
+                with metrics.timed('wait_active', tasks[task_id]):
+                    wait_for_files_active([uploaded_file])
+            except TimeoutError as e:
+                print(f"Error waiting for the uploaded file: {e}")
+                tasks[task_id]['progress'] = 'Timed out waiting for Gemini to process the file.'
+                tasks[task_id]['status'] = 'Failed'
+                return None
+            except Exception as e:
+                print(f"Error waiting for the uploaded file: {e}")
+                tasks[task_id]['progress'] = 'Gemini could not process the uploaded file.'
+                tasks[task_id]['status'] = 'Failed'
+                return None
+            content_part = uploaded_file
 
         tasks[task_id]['progress'] = 'Generating analysis report...'
         # Start chat session with the designed prompt
@@ -88,8 +424,8 @@ def process_content(username, content, task_id, tasks):
                 {
                     "role": "user",
                     "parts": [
-                        uploaded_file,
-                        "You are an advanced AI linguist, psychologist, and behavior analyst trained to analyze digital personas. The attached file contains publicly scraped data of a Reddit account, including their posts and comments. Your task is to create a highly detailed and objective report analyzing the personality, behavior, and potential real-life characteristics of the individual behind this account. Be thorough, no sugarcoating, and support every conclusion with evidence from their posts or comments. You have to be in detail as much as possible breakdown everything. The analysis should be structured as follows:\n\n### 1. **General Overview**\n   - Summarize their overall Reddit activity.\n   - Identify the primary subreddits they engage with and their interaction patterns.\n   - Highlight any notable quirks or unique behaviors.\n\n### 2. **Personality Traits**\n   - Writing Style:\n     - Do they use a lot of slang, swear words, or formal language?\n     - Are they concise or verbose? How articulate are they?\n   - Emotional Tone:\n     - Do they appear sarcastic, angry, empathetic, or neutral or what?\n     - Identify recurring emotional patterns (e.g., consistent frustration, humor, kindness, etc).\n   - Recurring Themes:\n     - What topics are they obsessed with (e.g., tech, politics, cats)?\n     - Any peculiar or niche interests that stand out?\n\n### 3. **Behavioral Red Flags**\n   - Problematic Behavior:\n     - Are there indications of toxic traits (e.g., misogyny, racism, trolling etc)?\n     - Provide evidence from specific posts/comments.\n   - Controversial Topics:\n     - Have they engaged in heated debates or controversial discussions? If so, which ones?\n   - Ethical Concerns:\n     - Any signs of stalking, harassment, or unethical behavior? Cite examples.\n\n### 4. **Psychological Insights**\n   - Infer potential personality disorders or quirks based on their patterns (e.g., narcissism, obsessive tendencies, etc).\n   - Are there signs of insecurity, overconfidence, or attention-seeking behavior or any other similar?\n   - Any traits that suggest leadership qualities, creativity, or empathy?\n\n### 5. **Social Dynamics**\n   - Interaction Style:\n     - Do they seek validation? Argue a lot? Or mostly observe?\n     - How do they respond to criticism—defensive, open-minded, dismissive?\n   - Relationship Indicators:\n     - Can you infer how they might interact with friends, colleagues, or family based on their tone and topics?\n\n### 6. **Real-Life Details (Deep Dive)**\n   - **Personal Information Extraction**:\n     - Extract any real-life details the user may have inadvertently shared (e.g., full name, location, city, state, country).\n     - Did they mention where they live or any specific places related to them (e.g., city, neighborhood)?\n   - **Family and Relationships**:\n     - If the user shared any information about their family (e.g., parents, siblings, children), include it.\n     - Look for any references to close relationships or social groups (e.g., friends, colleagues, romantic partners).\n     - Note if they referenced any personal struggles, relationships with family, or any other intimate details they’ve discussed.\n   - **Detailed Analysis of Real-Life Connections**:\n     - Does the person mention any specific events or people in their personal life? (E.g., family holidays, relationships, problems with peers, etc.)\n     - What can be inferred about their social circles or living environment based on the information shared?\n\n### 7. **Judgment and Prediction**\n   - Is this person likely a positive or negative influence in real life? Why?\n   - What kind of individual might they be in real-world settings (e.g., introvert, extrovert, leader, loner)?\n   - Predict their personality in real life with evidence-backed reasoning.\n\n### 8. **Detailed Proofs**\n   - For every conclusion you make, cite specific posts, comments, or patterns from the data. Use quotes or direct references for clarity.\n   - Example: \n     - \"The user exhibits signs of trolling. In [this comment](https://reddit.com/comment_id), they mocked someone’s opinion without adding value.\"\n     - \"Evidence of recurring sarcasm: 'Yeah, sure, because *that’s* going to solve the world’s problems' [Post in r/sarcasm].\"\n     - \"Signs of toxic masculinity in [this post](https://reddit.com/post_id): 'Women these days just want...'\"\n\n### 9. **Report Structure**\n   - **Concise Headings:** Use bullet points, headers, and sub-headers for readability.\n   - **Language Style:** Be sharp, direct, and unapologetic, as if preparing a psychological profile for an investigation. \n   - **Tone:** Maintain professionalism, but don’t shy away from brutally honest insights.\n\n### Example Outputs:\n- *\"Bro, you're essentially Reddit's poster child for trolling. Here’s the proof: [links to comments]. Your obsession with debating flat-earthers in r/science suggests an inferiority complex and a need to assert intellectual dominance.\"*\n- *\"Based on [this post](https://reddit.com/post_id) in r/MGTOW, your comments reveal a pattern of misogynistic tendencies and anger issues. This is consistent across multiple threads.\"*\n- *\"You’ve replied 'LOL cringe' to 37 people in r/memes. This indicates dismissive behavior and likely a lack of constructive engagement in real life.\"*\n\nFinally, ensure your report is brutally honest, free of bias, and as comprehensive as possible.\n"
+                        content_part,
+                        ANALYSIS_PROMPT
                     ],},
                         {
                         "role": "model",
@@ -101,26 +437,25 @@ def process_content(username, content, task_id, tasks):
         )
 
         try:
-            response = chat_session.send_message("Yes Do IT!!!!")
+            with metrics.timed('generate', tasks[task_id]):
+                if STREAM_REPORT:
+                    response = chat_session.send_message("Yes Do IT!!!!", stream=True)
+                    report_text = stream_report(username, response, task_id, tasks)
+                else:
+                    response = chat_session.send_message("Yes Do IT!!!!")
+                    report_text = response.text
+            record_usage(response, "generate")
         except Exception as e:
             print(f"Error during chat session: {e}")
-            os.remove(temp_input_file)  # Clean up
             tasks[task_id]['progress'] = 'Failed during Gemini processing.'
             tasks[task_id]['status'] = 'Failed'
             return None
 
-        # Save the response to a unique .md file
-        unique_id = uuid.uuid4().hex
-        output_filename = f"response_output_{username}_{unique_id}.md"
-        output_path = os.path.join(temp_dir, output_filename)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(response.text)
-
-        print(f"Response saved to {output_path}")
-        tasks[task_id]['progress'] = 'Report generated successfully.'
-        tasks[task_id]['status'] = 'Completed'
-        tasks[task_id]['report_path'] = output_path
-        return output_path
+        print("Stage timings: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in tasks[task_id]['timings'].items()))
+        report_cache.set(cache_key, report_text)
+        if STREAM_REPORT:
+            return tasks[task_id]['report_path']
+        return save_report(username, report_text, task_id, tasks)
 
     except Exception as e:
-        pass
+        print(f"Error processing data for user {username}: {e}")
@@ -0,0 +1,351 @@
+# jobs.py
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+import metrics
+from models import Job
+
+# Keys of a task's progress dict that are mirrored to the Job table
+PROGRESS_FIELDS = (
+    'status',
+    'progress',
+    'report_path',
+    'report_id',
+    'total_posts',
+    'scraped_posts',
+    'total_comments',
+    'scraped_comments',
+    'generated_tokens',
+    'timings',
+)
+
+class JobState(dict):
+    """
+    Progress dict for a running job.
+    Behaves like the plain task dicts used by the scraper and Gemini processor,
+    but writes its progress fields to the Job table at most once per
+    flush interval, and immediately whenever the status changes.
+    Every change bumps `version` and wakes threads in wait_for_change().
+    """
+
+    def __init__(self, app, job_id, flush_interval=1.0, **fields):
+        super().__init__(**fields)
+        self.app = app
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.version = 0
+        self._changed = threading.Condition()
+        self._last_flush = 0.0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+        if key == 'status' or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def wait_for_change(self, version, timeout=None):
+        """
+        Block until the state differs from `version` (or timeout) and return the current version.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def flush(self):
+        """
+        Persist the current progress to the database.
+        """
+        self._last_flush = time.monotonic()
+        values = {key: self[key] for key in PROGRESS_FIELDS if key in self}
+        values['updated_at'] = datetime.utcnow()
+        if values.get('status') in ('Completed', 'Failed'):
+            values['coalesce_key'] = None  # Later submissions start a new job
+        with self.app.app_context():
+            try:
+                Job.query.filter_by(id=self.job_id).update(values, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving progress for job {self.job_id}: {e}")
+
+class JobQueue:
+    """
+    Fixed-size worker pool that runs jobs queued in the Job table.
+    Workers claim queued jobs from the shared database, so every gunicorn
+    worker sees the same queue and queued jobs survive a restart. Idle workers
+    periodically requeue jobs whose process died, and a heartbeat keeps the jobs
+    running in this process from looking dead.
+    """
+
+    def __init__(self, app=None, handler=None):
+        self.app = None
+        self.handler = None
+        self.tasks = {}  # In-process progress dicts of the jobs this process is running
+        self._workers = []
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._jobs_changed = threading.Condition()  # Notified when a job starts or finishes here
+        if app is not None:
+            self.init_app(app, handler)
+
+    def init_app(self, app, handler):
+        """
+        Bind the queue to the app. `handler(reddit_username, job_id)` runs one job
+        and reports progress through `self.tasks[job_id]`.
+        """
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_QUEUE_LIMIT', 50)
+        app.config.setdefault('JOB_POLL_INTERVAL', 2.0)
+        app.config.setdefault('JOB_STALE_SECONDS', 900)
+        app.config.setdefault('JOB_STALE_SWEEP_INTERVAL', 60)
+        app.config.setdefault('JOB_HEARTBEAT_INTERVAL', 60)  # Must stay well below JOB_STALE_SECONDS
+        self.app = app
+        self.handler = handler
+        # Workers are started lazily so that CLI commands (e.g. `flask db upgrade`)
+        # importing the app don't start polling a table that may not exist yet.
+        app.before_request(self.start)
+
+    def start(self):
+        """
+        Start the worker threads and the heartbeat once per process.
+        """
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            self._requeue_stale_jobs()
+            self._last_sweep = time.monotonic()
+            for i in range(self.app.config['JOB_WORKERS']):
+                worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            heartbeat.start()
+            self._workers.append(heartbeat)
+
+    def submit(self, reddit_username, user_id=None, coalesce_key=None):
+        """
+        Queue a job. Returns the new Job, or None if the queue is full.
+        Jobs with a `coalesce_key` are single-flight: while a job with the same key is
+        queued or running, that job is returned instead of queueing a duplicate, so
+        every submitter follows the same progress and downloads the same report.
+        The key is unique in the Job table until the job finishes, which also settles
+        simultaneous submissions from different processes. A running job that has
+        made no progress for JOB_STALE_SECONDS lost its worker; it is put back in the
+        queue before being returned.
+        """
+        if coalesce_key is not None:
+            active = Job.query.filter_by(coalesce_key=coalesce_key).first()
+            if active is not None:
+                if self._requeue_stale_jobs(active.id):
+                    db.session.refresh(active)
+                    self.start()
+                    self._wakeup.set()
+                metrics.inc("jobs_coalesced_total", help_text="Submissions attached to an identical queued or running job.")
+                return active
+
+        queued = Job.query.filter_by(status='Queued').count()
+        if queued >= self.app.config['JOB_QUEUE_LIMIT']:
+            return None
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            reddit_username=reddit_username,
+            status='Queued',
+            progress='Waiting in queue...',
+            scraped_posts=0,
+            scraped_comments=0,
+            coalesce_key=coalesce_key,
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Someone queued the same job since we checked; attach to theirs
+            db.session.rollback()
+            if coalesce_key is None:
+                raise
+            return self.submit(reddit_username, user_id, coalesce_key)
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def queue_position(self, job):
+        """
+        1-based position of a queued job, or 0 if it is no longer queued.
+        """
+        if job.status != 'Queued':
+            return 0
+        return Job.query.filter(Job.status == 'Queued', Job.created_at <= job.created_at).count()
+
+    def snapshot(self, job_id):
+        """
+        Current progress of a job as a dict, or None if the job does not exist.
+        Jobs running in this process are read from memory, others from the database.
+        """
+        state = self.tasks.get(job_id)
+        if state is not None:
+            snapshot = {key: state.get(key) for key in PROGRESS_FIELDS if key != 'report_path'}
+            snapshot['queue_position'] = 0
+            return snapshot
+
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return None
+        snapshot = {key: getattr(job, key) for key in PROGRESS_FIELDS if key != 'report_path'}
+        snapshot['queue_position'] = self.queue_position(job)
+        return snapshot
+
+    def wait_for_change(self, job_id, version=None, timeout=15.0):
+        """
+        Block until a job's progress may have changed and return the version to pass next time.
+        Jobs running in this process are waited on directly; for queued jobs and jobs
+        running in another process we can only wait for the poll interval.
+        """
+        state = self.tasks.get(job_id)
+        if state is not None:
+            return state.wait_for_change(version, timeout)
+
+        with self._jobs_changed:
+            self._jobs_changed.wait(min(timeout, self.app.config['JOB_POLL_INTERVAL']))
+        return None
+
+    def _notify_jobs_changed(self):
+        with self._jobs_changed:
+            self._jobs_changed.notify_all()
+
+    def _requeue_stale_jobs(self, *job_ids):
+        """
+        Put jobs whose worker died (no progress for JOB_STALE_SECONDS) back in the queue,
+        only those among `job_ids` if given. Returns the number of jobs requeued.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_STALE_SECONDS'])
+        with self.app.app_context():
+            try:
+                query = Job.query.filter(
+                    Job.status.in_(('In Progress', 'Processing')),
+                    Job.updated_at < cutoff,
+                )
+                if job_ids:
+                    query = query.filter(Job.id.in_(job_ids))
+                requeued = query.update({'status': 'Queued', 'progress': 'Waiting in queue...'}, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error requeueing stale jobs: {e}")
+                return 0
+        if requeued:
+            print(f"Requeued {requeued} stale job(s)")
+            metrics.inc("jobs_requeued_total", requeued, help_text="Jobs put back in the queue after their worker died.")
+        return requeued
+
+    def _sweep_stale_jobs(self):
+        """
+        Requeue stale jobs if no worker of this process has checked for
+        JOB_STALE_SWEEP_INTERVAL seconds. Returns the number of jobs requeued.
+        """
+        with self._lock:
+            if time.monotonic() - self._last_sweep < self.app.config['JOB_STALE_SWEEP_INTERVAL']:
+                return 0
+            self._last_sweep = time.monotonic()
+        return self._requeue_stale_jobs()
+
+    def _heartbeat_loop(self):
+        """
+        Refresh updated_at of the jobs running in this process, so that one spending
+        a long time in a single call (e.g. a non-streamed Gemini generation) is not
+        mistaken for a job whose worker died.
+        """
+        while True:
+            time.sleep(self.app.config['JOB_HEARTBEAT_INTERVAL'])
+            job_ids = list(self.tasks)
+            if not job_ids:
+                continue
+            with self.app.app_context():
+                try:
+                    Job.query.filter(
+                        Job.id.in_(job_ids),
+                        Job.status.in_(('In Progress', 'Processing')),
+                    ).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error refreshing running jobs: {e}")
+
+    def _claim_next(self):
+        """
+        Atomically move the oldest queued job to 'In Progress'.
+        Returns (job_id, reddit_username, created_at), or None if nothing was claimed.
+        """
+        job = Job.query.filter_by(status='Queued').order_by(Job.created_at).first()
+        if job is None:
+            return None
+        job_id, reddit_username, created_at = job.id, job.reddit_username, job.created_at
+        claimed = Job.query.filter_by(id=job_id, status='Queued').update(
+            {'status': 'In Progress', 'progress': 'Task started.', 'updated_at': datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return (job_id, reddit_username, created_at) if claimed else None
+
+    def _worker_loop(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    claimed = self._claim_next()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error claiming job: {e}")
+                    claimed = None
+
+            if claimed is None:
+                if self._sweep_stale_jobs():
+                    continue
+                self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+                continue
+
+            job_id, reddit_username, created_at = claimed
+            queue_wait = (datetime.utcnow() - created_at).total_seconds()
+            metrics.observe("stage_duration_seconds", queue_wait, stage='queue_wait')
+            state = JobState(
+                self.app,
+                job_id,
+                status='In Progress',
+                progress='Task started.',
+                report_path=None,
+                report_id=None,
+                total_posts=0,
+                scraped_posts=0,
+                total_comments=0,
+                scraped_comments=0,
+                generated_tokens=0,
+                timings={'queue_wait': round(queue_wait, 3)},
+            )
+            self.tasks[job_id] = state
+            self._notify_jobs_changed()
+            try:
+                self.handler(reddit_username, job_id)
+            except Exception as e:
+                print(f"Error in job {job_id}: {e}")
+                state['progress'] = 'An unexpected error occurred.'
+                state['status'] = 'Failed'
+            finally:
+                metrics.inc("jobs_finished_total", help_text="Jobs finished, by final status.", status=state.get('status'))
+                state.flush()
+                self.tasks.pop(job_id, None)
+                self._notify_jobs_changed()
+
+job_queue = JobQueue()
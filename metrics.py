@@ -0,0 +1,135 @@
+# metrics.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "reddit_gemini_"
+
+# Histogram buckets for stage durations, in seconds
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_help = {}
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def inc(name, amount=1, help_text="", **labels):
+    """
+    Add `amount` to a counter.
+    """
+    with _lock:
+        key = (name, _label_key(labels))
+        _counters[key] = _counters.get(key, 0) + amount
+        if help_text:
+            _help[name] = help_text
+
+def observe(name, value, help_text="", **labels):
+    """
+    Record one observation in a histogram.
+    """
+    with _lock:
+        key = (name, _label_key(labels))
+        histogram = _histograms.setdefault(key, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram[i] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+        if help_text:
+            _help[name] = help_text
+
+@contextmanager
+def timed(stage, task=None):
+    """
+    Time a pipeline stage: records it in the stage duration histogram and,
+    if a task dict is given, adds it to the task's 'timings' breakdown.
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.monotonic() - start, task)
+
+def record_stage(stage, seconds, task=None):
+    """
+    Record a stage duration measured elsewhere, as timed() does.
+    """
+    observe("stage_duration_seconds", seconds, help_text="Time spent in each pipeline stage.", stage=stage)
+    if task is not None:
+        timings = dict(task.get('timings') or {})
+        timings[stage] = round(timings.get(stage, 0) + seconds, 3)
+        task['timings'] = timings  # Reassign so persisted task dicts notice the change
+
+def counter_values():
+    """
+    Current counter values as {(name, labels): value}, with labels as sorted (key, value) pairs.
+    """
+    with _lock:
+        return dict(_counters)
+
+def reset():
+    """
+    Clear all recorded metrics.
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def render_prometheus(gauges=(), counters=()):
+    """
+    Render all metrics in the Prometheus text exposition format.
+    `gauges` and `counters` are iterables of (name, value, labels dict, help text)
+    computed at scrape time, such as cache statistics; samples of one name are
+    written together wherever they appear in the iterable.
+    """
+    lines = []
+    with _lock:
+        recorded = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+        help_texts = dict(_help)
+
+    declared = set()
+
+    def declare(name, metric_type):
+        if name not in declared:
+            declared.add(name)
+            if help_texts.get(name):
+                lines.append(f"# HELP {METRIC_PREFIX}{name} {help_texts[name]}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+
+    for (name, labels), value in recorded:
+        declare(name, "counter")
+        lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), histogram in histograms:
+        declare(name, "histogram")
+        for bound, count in zip(DURATION_BUCKETS, histogram):
+            lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram[-1]}")
+        lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {histogram[-2]}")
+        lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(labels)} {histogram[-1]}")
+
+    for metric_type, samples in (("counter", counters), ("gauge", gauges)):
+        families = {}  # Name -> samples, in order of first appearance
+        for name, value, labels, help_text in samples:
+            families.setdefault(name, []).append((value, labels))
+            help_texts[name] = help_text
+        for name, family in families.items():
+            declare(name, metric_type)
+            for value, labels in family:
+                lines.append(f"{METRIC_PREFIX}{name}{_format_labels(sorted(labels.items()))} {value}")
+
+    return "\n".join(lines) + "\n"
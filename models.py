@@ -1,12 +1,71 @@
 # models.py
 
+import os
+import threading
+import time
+from datetime import datetime
 from extensions import db, login_manager
 from flask_login import UserMixin
+from sqlalchemy.orm import make_transient_to_detached
+
+# Seconds a logged-in user is served from memory instead of the database
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL") or 60)
+
+class UserCache:
+    """
+    Per-process TTL cache of the users Flask-Login loads on every request.
+    Entries are detached copies of the user's columns and are attached to the
+    request's session with merge(load=False), so a hit runs no query. Updates
+    and deletes made through this process invalidate the entry; changes made by
+    other processes are picked up once the TTL runs out.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Return the user with this id, attached to the current session, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return db.session.merge(entry[1], load=False)
+
+        self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is not None and self.ttl > 0:
+            snapshot = User(id=user.id, username=user.username, email=user.email, password=user.password)
+            make_transient_to_detached(snapshot)
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters and number of cached users.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+user_cache = UserCache(USER_CACHE_TTL)
 
 # User loader callback for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -16,3 +75,45 @@ class User(db.Model, UserMixin):
 
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
+
+    @classmethod
+    def find_by_email(cls, email):
+        """
+        Look a user up by email through the unique index on the column.
+        """
+        return cls.query.filter_by(email=email).first()
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    reddit_username = db.Column(db.String(50), nullable=False)
+    coalesce_key = db.Column(db.String(80), unique=True)  # Held only while queued or running; see JobQueue.submit
+    status = db.Column(db.String(20), nullable=False, default='Queued', index=True)
+    progress = db.Column(db.Text, default='')
+    report_path = db.Column(db.String(500))  # Report file while it is being generated
+    report_id = db.Column(db.String(64), db.ForeignKey('report.id'), index=True)  # Stored report once completed
+    total_posts = db.Column(db.Integer)  # NULL while the total is still unknown
+    scraped_posts = db.Column(db.Integer, default=0)
+    total_comments = db.Column(db.Integer)
+    scraped_comments = db.Column(db.Integer, default=0)
+    generated_tokens = db.Column(db.Integer, default=0)  # Estimated report tokens received so far
+    timings = db.Column(db.JSON)  # Seconds spent in each pipeline stage
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"Job('{self.id}', '{self.reddit_username}', '{self.status}')"
+
+class Report(db.Model):
+    id = db.Column(db.String(64), primary_key=True)  # SHA-256 of the report content
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"Report('{self.id}', {self.size})"
@@ -0,0 +1,37 @@
+# passwords.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from extensions import bcrypt
+
+# bcrypt hashes computed at once per process. bcrypt releases the GIL, so without a
+# bound a burst of signups and logins can take every core from the other requests.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 2)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    """
+    Return the process-wide hashing pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _pool
+
+def hash_password(password):
+    """
+    Hash a password at the configured BCRYPT_LOG_ROUNDS, on the hashing pool.
+    """
+    return get_hash_pool().submit(bcrypt.generate_password_hash, password).result().decode('utf-8')
+
+def check_password(password_hash, password):
+    """
+    Check a password against its hash, on the hashing pool.
+    """
+    return get_hash_pool().submit(bcrypt.check_password_hash, password_hash, password).result()
@@ -0,0 +1,199 @@
+# records.py
+
+import re
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+@dataclass
+class ItemRecord:
+    """
+    One scraped post or comment. Declares __slots__ so that holding every item
+    of a large account costs a few small objects rather than formatted markdown.
+    """
+    __slots__ = ('id', 'kind', 'subreddit', 'created_utc', 'title', 'body', 'url', 'link_id', 'parent_id', 'parent_body')
+
+    id: str  # Fullname: t3_ for posts, t1_ for comments
+    kind: str  # 'post' or 'comment'
+    subreddit: str
+    created_utc: float
+    title: str  # Post title, or the title of the post a comment was made on
+    body: str  # Post selftext or comment body
+    url: Optional[str]  # Posts only
+    link_id: Optional[str]  # Comments only: fullname of the post
+    parent_id: Optional[str]  # Comments only: fullname of the parent comment, None for top-level comments
+    parent_body: Optional[str]  # Comments only: text of the parent comment once resolved
+
+def record_to_dict(record):
+    return asdict(record)
+
+def record_from_dict(data):
+    return ItemRecord(**data)
+
+def format_post(post):
+    """
+    Render a post record as markdown.
+    """
+    return (
+        f"### Title: {post.title}\n"
+        f"**Subreddit:** {post.subreddit}\n"
+        f"**URL:** {post.url}\n"
+        f"**Content:** {post.body or 'No Content'}\n\n"
+    )
+
+def format_comment(comment):
+    """
+    Render a comment record as markdown.
+    """
+    comment_data = (
+        f"### Comment:\n{comment.body}\n"
+        f"**Subreddit:** {comment.subreddit}\n"
+        f"**Post:** {comment.title}\n"
+    )
+    if comment.parent_body is not None:
+        comment_data += f"**Parent Comment:** {comment.parent_body}\n"
+    return comment_data + "\n"
+
+def render_markdown(username, posts, comments):
+    """
+    Yield the markdown report input piece by piece, one item at a time.
+    """
+    yield f"# Reddit User: {username}\n\n## 📝 Posts:\n\n"
+    for post in posts:
+        yield format_post(post)
+    yield "\n## 💬 Comments:\n\n"
+    for comment in comments:
+        yield format_comment(comment)
+
+def _markup_length(render, **fields):
+    """
+    Characters `render` adds around the fields of an item.
+    """
+    empty = dict(id='', kind='', subreddit='', created_utc=0, title='', body='', url='', link_id=None, parent_id=None, parent_body=None)
+    empty.update(fields)
+    return len(render(ItemRecord(**empty))) - sum(len(value) for value in fields.values())
+
+POST_MARKUP_LENGTH = _markup_length(format_post, body='x')  # An empty body renders as 'No Content'
+COMMENT_MARKUP_LENGTH = _markup_length(format_comment)
+PARENT_MARKUP_LENGTH = _markup_length(format_comment, parent_body='') - COMMENT_MARKUP_LENGTH
+
+def markdown_length(username, posts, comments):
+    """
+    Length in characters of render_markdown's output, added up from the field
+    lengths without rendering anything.
+    """
+    length = len(f"# Reddit User: {username}\n\n## 📝 Posts:\n\n\n## 💬 Comments:\n\n")
+    for post in posts:
+        length += POST_MARKUP_LENGTH + len(post.title) + len(post.subreddit) + len(str(post.url)) + len(post.body or 'No Content')
+    for comment in comments:
+        length += COMMENT_MARKUP_LENGTH + len(comment.body) + len(comment.subreddit) + len(comment.title)
+        if comment.parent_body is not None:
+            length += PARENT_MARKUP_LENGTH + len(comment.parent_body)
+    return length
+
+# Bodies Reddit shows in place of deleted or moderator-removed content
+DELETED_BODIES = ('[deleted]', '[removed]')
+
+COMPACT_FORMAT_NOTE = (
+    "Posts and comments are grouped by subreddit, most active first, and then by thread. "
+    "A thread heading is the post's id and title; \"Post\" threads were posted by this user. "
+    "Every comment starts with its id. A reply names the comment it answers, and that comment's "
+    "text is quoted once, before the first reply to it, unless it is one of this user's comments "
+    "listed here. Deleted, removed and empty items are left out. "
+    "Link to a post: https://www.reddit.com/comments/<post id without t3_>/\n"
+)
+
+def squeeze(text):
+    """
+    Strip a body and collapse blank lines, so entries stay separated by exactly one
+    blank line, and escape markdown headings so they can't be mistaken for sections.
+    Returns '' for deleted, removed and empty bodies.
+    """
+    text = (text or '').strip()
+    if text in DELETED_BODIES:
+        return ''
+    return re.sub(r"(?m)^#", r"\\#", re.sub(r"\n\s*\n", "\n", text))
+
+def group_threads(posts, comments):
+    """
+    Group records by subreddit and then by thread (the post they belong to),
+    dropping comments without text. Subreddits with the most items come first,
+    threads with the latest activity first, and items within a thread are in
+    the order they were written.
+    Returns [(subreddit, [(thread_id, title, post_or_None, comments)])].
+    """
+    threads = {}
+    for post in posts:
+        thread = threads.setdefault(post.id, {'subreddit': post.subreddit, 'title': post.title, 'post': None, 'comments': []})
+        thread['post'] = post
+        thread['title'] = post.title
+    for comment in comments:
+        if not squeeze(comment.body):
+            continue
+        thread = threads.setdefault(comment.link_id, {'subreddit': comment.subreddit, 'title': comment.title, 'post': None, 'comments': []})
+        thread['comments'].append(comment)
+
+    subreddits = {}
+    for thread_id, thread in threads.items():
+        thread['comments'].sort(key=lambda comment: comment.created_utc)
+        items = thread['comments'] + ([thread['post']] if thread['post'] else [])
+        thread['latest'] = max(item.created_utc for item in items)
+        thread['size'] = len(items)
+        subreddits.setdefault(thread['subreddit'], []).append((thread_id, thread))
+
+    grouped = []
+    for subreddit, subreddit_threads in sorted(
+        subreddits.items(), key=lambda entry: -sum(thread['size'] for _, thread in entry[1])
+    ):
+        subreddit_threads.sort(key=lambda entry: -entry[1]['latest'])
+        grouped.append((subreddit, [
+            (thread_id, thread['title'], thread['post'], thread['comments'])
+            for thread_id, thread in subreddit_threads
+        ]))
+    return grouped
+
+def render_compact_markdown(username, posts, comments):
+    """
+    Yield a compacted version of render_markdown's output: the same posts and
+    comments grouped by subreddit and thread, each thread title written once,
+    each quoted parent comment written once and referenced by id afterwards,
+    and deleted, removed or empty items left out.
+    """
+    yield f"# Reddit User: {username}\n\n{COMPACT_FORMAT_NOTE}\n"
+    own_comments = {comment.id for comment in comments if squeeze(comment.body)}
+    quoted = set()
+    for subreddit, threads in group_threads(posts, comments):
+        yield f"## r/{subreddit}\n\n"
+        for thread_id, title, post, thread_comments in threads:
+            if post is not None:
+                lines = [f"### Post {thread_id}: {title}"]
+                # Self posts link to themselves; only link posts need their URL
+                if post.url and f"/comments/{thread_id[3:]}/" not in post.url:
+                    lines.append(f"Link: {post.url}")
+                body = squeeze(post.body)
+                if body:
+                    lines.append(body)
+            else:
+                lines = [f"### Thread {thread_id}: {title}"]
+            yield "\n".join(lines) + "\n\n"
+
+            for comment in thread_comments:
+                parent_id = comment.parent_id
+                if parent_id is None:
+                    yield f"{comment.id}:\n{squeeze(comment.body)}\n\n"
+                    continue
+                parent_body = squeeze(comment.parent_body)
+                if parent_id not in own_comments and parent_id not in quoted and parent_body:
+                    quoted.add(parent_id)
+                    yield f"> {parent_id}: {parent_body}\n\n"
+                yield f"{comment.id} (reply to {parent_id}):\n{squeeze(comment.body)}\n\n"
+
+def write_rendered(path, pieces):
+    """
+    Stream rendered pieces to a file. Returns the number of characters written.
+    """
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for piece in pieces:
+            f.write(piece)
+            written += len(piece)
+    return written
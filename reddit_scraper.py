@@ -1,119 +1,530 @@
 # reddit_scraper.py
 
-import praw
-from prawcore.exceptions import RequestException, ServerError, ResponseException, Forbidden
 import os
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from disk_cache import DiskCache
+import metrics
+from records import ItemRecord, record_to_dict, record_from_dict, render_markdown, render_compact_markdown, markdown_length, write_rendered
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Reddit instance
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    user_agent=os.getenv("REDDIT_USER_AGENT")
+# Reddit instance, created on first use so that importing this module (as every
+# web worker does) does not pay for importing praw
+_reddit = None
+_reddit_lock = threading.Lock()
+
+def reddit_client_settings():
+    """
+    Keyword arguments for praw.Reddit / asyncpraw.Reddit.
+    REDDIT_OAUTH_URL and REDDIT_URL point the clients at another server, e.g. a local fake.
+    """
+    settings = {
+        "client_id": os.getenv("REDDIT_CLIENT_ID"),
+        "client_secret": os.getenv("REDDIT_CLIENT_SECRET"),
+        "user_agent": os.getenv("REDDIT_USER_AGENT"),
+    }
+    if os.getenv("REDDIT_OAUTH_URL"):
+        settings["oauth_url"] = os.getenv("REDDIT_OAUTH_URL")
+    if os.getenv("REDDIT_URL"):
+        settings["reddit_url"] = os.getenv("REDDIT_URL")
+    return settings
+
+def get_reddit_client():
+    """
+    Return the shared Reddit client, creating it on the first call.
+    """
+    global _reddit
+    if _reddit is None:
+        with _reddit_lock:
+            if _reddit is None:
+                import praw
+                _reddit = praw.Reddit(**reddit_client_settings())
+    return _reddit
+
+def set_reddit_client(client):
+    """
+    Replace the Reddit client, e.g. with a local stand-in for benchmarks.
+    The client needs the praw.Reddit methods used here: redditor(), info() and auth.limits.
+    """
+    global _reddit
+    with _reddit_lock:
+        _reddit = client
+
+# Fetch the posts and comments listings in parallel (set to 0 to fetch them one after the other)
+CONCURRENT_LISTINGS = (os.getenv("REDDIT_CONCURRENT_LISTINGS") or "1") != "0"
+
+# 'threaded' scrapes with PRAW in the job's thread; 'async' runs the requests of all
+# jobs on one asyncio event loop with asyncpraw (see async_scraper.py)
+SCRAPE_ENGINE = os.getenv("REDDIT_SCRAPE_ENGINE") or "threaded"
+
+# Base of the exponential backoff between retries of a failed Reddit request, in seconds
+RETRY_BACKOFF_FACTOR = float(os.getenv("REDDIT_RETRY_BACKOFF") or 2)
+
+# Hand Gemini the compacted rendering (grouped, deduplicated, without deleted items)
+COMPACT_SCRAPED_DATA = (os.getenv("COMPACT_SCRAPED_DATA") or "1") != "0"
+
+# Scraped item records per Reddit user, refreshed incrementally on repeat requests.
+# Bump SCRAPE_CACHE_VERSION when the ItemRecord fields change.
+SCRAPE_CACHE_VERSION = 2
+scrape_cache = DiskCache(
+    os.getenv("SCRAPE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "reddit_scrape_cache"),
+    ttl=int(os.getenv("SCRAPE_CACHE_TTL") or 24 * 60 * 60),
+    max_bytes=int(os.getenv("SCRAPE_CACHE_MAX_MB") or 500) * 1024 * 1024,
+)
+
+# Listing progress of scrapes that have not finished yet, so that a job requeued after
+# a crash or deploy, or submitted again after failing, continues where it stopped
+scrape_checkpoints = DiskCache(
+    os.getenv("SCRAPE_CHECKPOINT_DIR") or os.path.join(tempfile.gettempdir(), "reddit_scrape_checkpoints"),
+    ttl=int(os.getenv("SCRAPE_CHECKPOINT_TTL") or 24 * 60 * 60),
+    max_bytes=int(os.getenv("SCRAPE_CHECKPOINT_MAX_MB") or 200) * 1024 * 1024,
 )
+# Seconds between checkpoint writes while a listing is being paged through
+SCRAPE_CHECKPOINT_INTERVAL = float(os.getenv("SCRAPE_CHECKPOINT_INTERVAL") or 10)
+
+class ScrapeCheckpoint:
+    """
+    Resumable state of one user's scrape: for each listing, the records collected
+    so far, the cursor (fullname of the last item of the last complete page),
+    whether the listing is finished and, if it finished at an already cached item,
+    that item's fullname. Listings report every page with update(); the
+    state is written to the checkpoint store at most every `interval` seconds and
+    whenever a listing finishes, and removed with clear() once the scrape is saved.
+    """
+
+    def __init__(self, store, key, interval=SCRAPE_CHECKPOINT_INTERVAL):
+        self.store = store
+        self.key = key
+        self.interval = interval
+        self._listings = {}
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        for name, saved in (store.get(key) or {}).items():
+            records = [record_from_dict(data) for data in saved['records']]
+            self._listings[name] = {
+                'records': records, 'count': len(records),
+                'after': saved['after'], 'done': saved['done'], 'stop': saved.get('stop'),
+            }
+
+    def resume(self, name, known_fullnames=()):
+        """
+        Saved (records, after, done) of a listing; ([], None, False) to start from the top.
+        A listing that finished at a cached item is only done while that item is still
+        in `known_fullnames`: if the cache entry expired or was evicted since, paging
+        continues right after the last saved record.
+        """
+        with self._lock:
+            listing = self._listings.get(name)
+            if listing is None:
+                return [], None, False
+            records = list(listing['records'][:listing['count']])
+            if listing['done'] and listing['stop'] is not None and listing['stop'] not in known_fullnames:
+                return records, records[-1].id if records else None, False
+            return records, listing['after'], listing['done']
 
-def wait_and_retry(func, *args, retries=5, backoff_factor=2, **kwargs):
+    def finished(self, *names):
+        """
+        Whether every named listing was paged through to its end.
+        """
+        with self._lock:
+            return all(name in self._listings and self._listings[name]['done'] for name in names)
+
+    def count(self, name):
+        with self._lock:
+            listing = self._listings.get(name)
+            return listing['count'] if listing else 0
+
+    def update(self, name, records, after, done=False, stop=None):
+        """
+        Record a listing's progress: `records` holds everything up to and including the
+        page ending at `after`, and `stop` the cached item the listing ended at, if any.
+        Returns True when the checkpoint should be saved now.
+        Only the first len(records) items are saved, so the caller may keep appending.
+        """
+        with self._lock:
+            self._listings[name] = {'records': records, 'count': len(records), 'after': after, 'done': done, 'stop': stop}
+            return done or time.monotonic() - self._last_save >= self.interval
+
+    def save(self):
+        with self._lock:
+            self._last_save = time.monotonic()
+            if not self._listings:
+                return
+            # Copy under the lock, convert outside it: the async engine updates from its event loop
+            listings = {
+                name: (listing['records'][:listing['count']], listing['after'], listing['done'], listing['stop'])
+                for name, listing in self._listings.items()
+            }
+        state = {
+            name: {'records': [record_to_dict(record) for record in records], 'after': after, 'done': done, 'stop': stop}
+            for name, (records, after, done, stop) in listings.items()
+        }
+        self.store.set(self.key, state)
+        metrics.inc("scrape_checkpoints_saved_total", help_text="Scrape checkpoints written.")
+
+    def clear(self):
+        with self._lock:
+            self._listings = {}
+        self.store.delete(self.key)
+
+def normalize_username(username):
+    """
+    Canonical form of a Reddit username, for cache and de-duplication keys.
+    Reddit usernames are case-insensitive.
+    """
+    return username.strip().lower()
+
+class RedditRateLimiter:
+    """
+    Token bucket shared by every thread that calls the Reddit API.
+    The bucket is refilled from Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset
+    headers, which PRAW exposes as reddit.auth.limits, so concurrent scrapers can use
+    the whole budget without running into 429s.
+    `get_client` returns the client whose headers are used.
+    """
+
+    def __init__(self, get_client, reserve=2):
+        self.get_client = get_client
+        self.reserve = reserve  # Requests kept back for calls already in flight
+        self._tokens = 0
+        self._last_limits = None
+        self._lock = threading.Lock()
+
+    def wait_time(self):
+        """
+        Seconds until Reddit's rate-limit window resets, or 0 if the budget is not exhausted.
+        """
+        limits = self.get_client().auth.limits
+        if limits.get("remaining") is None or limits.get("reset_timestamp") is None:
+            return 0
+        if limits["remaining"] > 0:
+            return 0
+        return max(limits["reset_timestamp"] - time.time(), 0)
+
+    def try_acquire(self):
+        """
+        Take a request from the budget if one is left. Returns 0 if it was taken,
+        otherwise the seconds until the rate-limit window resets.
+        """
+        with self._lock:
+            limits = self.get_client().auth.limits
+            remaining = limits.get("remaining")
+            reset_timestamp = limits.get("reset_timestamp")
+            if remaining is None or reset_timestamp is None:
+                return 0  # No response headers seen yet
+
+            # Every response updates the headers; resync the bucket when they change
+            if (remaining, reset_timestamp) != self._last_limits:
+                self._last_limits = (remaining, reset_timestamp)
+                self._tokens = remaining - self.reserve
+
+            now = time.time()
+            if self._tokens >= 1 or now >= reset_timestamp:
+                self._tokens -= 1
+                return 0
+            return reset_timestamp - now
+
+    def acquire(self):
+        """
+        Block until a request fits in the current rate-limit window.
+        """
+        while True:
+            wait_time = self.try_acquire()
+            if not wait_time:
+                return
+            print(f"Reddit rate limit budget used up. Waiting {wait_time:.0f} seconds...")
+            time.sleep(wait_time)
+
+reddit_rate_limiter = RedditRateLimiter(get_reddit_client)
+
+class ScrapeError(Exception):
+    """
+    A listing page or info batch could not be fetched, so the scraped data would be incomplete.
+    """
+
+def wait_and_retry(func, *args, retries=5, backoff_factor=RETRY_BACKOFF_FACTOR, **kwargs):
     """
     Retry a function if a rate limit or server error occurs.
+    When Reddit reports the rate-limit budget as used up, wait for the window to reset
+    instead of the plain backoff.
     """
+    from prawcore.exceptions import RequestException, ServerError, ResponseException, Forbidden
+
     attempt = 0
     while attempt < retries:
         try:
             return func(*args, **kwargs)
-        except (RequestException, ServerError, ResponseException) as e:
-            attempt += 1
-            wait_time = backoff_factor ** attempt
-            print(f"Error: {e}. Retrying in {wait_time} seconds...")
-            time.sleep(wait_time)
         except Forbidden:
             print("Access forbidden. Skipping...")
             return None
+        except (RequestException, ServerError, ResponseException) as e:
+            attempt += 1
+            metrics.inc("reddit_retries_total", help_text="Reddit API calls retried after an error.")
+            wait_time = max(backoff_factor ** attempt, reddit_rate_limiter.wait_time())
+            print(f"Error: {e}. Retrying in {wait_time:.0f} seconds...")
+            time.sleep(wait_time)
     print(f"Failed after {retries} attempts.")
     return None
 
+def fetch_listing(listing, to_record, known_fullnames, on_item, page_size=100, checkpoint=None, name=None):
+    """
+    Page through a newest-first user listing (user.submissions or user.comments),
+    one request per page, until a page comes back empty or an already cached item is reached.
+    With a checkpoint, continues after the last page saved under `name` and reports
+    every page to it.
+    Returns the new items converted with `to_record`.
+    """
+    records, after, done = checkpoint.resume(name, known_fullnames) if checkpoint else ([], None, False)
+    stop = None
+    while not done:
+        params = {"after": after} if after else {}
+        reddit_rate_limiter.acquire()
+        metrics.inc("reddit_api_calls_total", help_text="Reddit API requests made.", endpoint="listing")
+        page = wait_and_retry(lambda: list(listing.new(limit=page_size, params=params)))
+        if page is None:
+            # Never treat a failed page as the end of the listing: the data would be cached as complete
+            raise ScrapeError(f"could not fetch the {name or 'listing'} page after {after or 'the first item'}")
+        for thing in page:
+            if thing.fullname in known_fullnames:
+                done = True
+                stop = thing.fullname
+                break
+            try:
+                records.append(to_record(thing))
+                on_item()
+            except Exception as item_error:
+                print(f"Error with item {thing.fullname}: {item_error}")
+        # Only an empty page ends a listing: Reddit may return short pages when it filters items out
+        if not page:
+            done = True
+        elif not done:
+            after = page[-1].fullname
+        if checkpoint and checkpoint.update(name, records, after, done, stop):
+            checkpoint.save()
+    return records
+
+def post_record(post):
+    return ItemRecord(
+        id=post.fullname,
+        kind='post',
+        subreddit=str(post.subreddit),
+        created_utc=post.created_utc,
+        title=post.title,
+        body=post.selftext,
+        url=post.url,
+        link_id=None,
+        parent_id=None,
+        parent_body=None,
+    )
+
+def comment_record(comment):
+    return ItemRecord(
+        id=comment.fullname,
+        kind='comment',
+        subreddit=str(comment.subreddit),
+        created_utc=comment.created_utc,
+        title=comment.link_title,  # Replaced by the resolved submission title when available
+        body=comment.body,
+        url=None,
+        link_id=comment.link_id,
+        parent_id=None if comment.is_root else comment.parent_id,
+        parent_body=None,
+    )
+
+def resolve_fullnames(fullnames, batch_size=100):
+    """
+    Fetch Reddit comments/submissions by fullname (t1_/t3_) in bulk.
+    Returns a dict mapping fullname to the fetched object. Raises ScrapeError if a
+    batch can't be fetched, rather than leaving those comments without parents.
+    """
+    unique_fullnames = list(dict.fromkeys(fullnames))
+    resolved = {}
+    for start in range(0, len(unique_fullnames), batch_size):
+        batch = unique_fullnames[start:start + batch_size]
+        reddit_rate_limiter.acquire()
+        metrics.inc("reddit_api_calls_total", help_text="Reddit API requests made.", endpoint="info")
+        things = wait_and_retry(lambda: list(get_reddit_client().info(fullnames=batch)))
+        if things is None:
+            raise ScrapeError(f"could not resolve {len(batch)} parent comments and posts")
+        for thing in things:
+            resolved[thing.fullname] = thing
+    return resolved
+
+def scraping_progress(scraped_posts, scraped_comments):
+    return f"Scraping posts and comments... ({scraped_posts} posts, {scraped_comments} comments so far)"
+
+def fetch_user_items(username, known_fullnames, task, checkpoint=None):
+    """
+    Threaded engine: fetch the user's posts and comments that are not in
+    `known_fullnames`, and the submissions and parent comments they refer to.
+    Updates the scraped counts in `task` as items arrive; listings continue from
+    `checkpoint` and report their pages to it.
+    Returns (new_posts, new_comments, resolved), or None if the user can't be fetched.
+    """
+    user = wait_and_retry(get_reddit_client().redditor, username)
+    if not user:
+        return None
+
+    def count_item(key):
+        task[key] += 1
+        task['progress'] = scraping_progress(task['scraped_posts'], task['scraped_comments'])
+
+    # Scrape posts and comments, concurrently unless disabled
+    listings = [
+        (user.submissions, post_record, lambda: count_item('scraped_posts'), 'posts'),
+        (user.comments, comment_record, lambda: count_item('scraped_comments'), 'comments'),
+    ]
+    if checkpoint:
+        task['scraped_posts'] = checkpoint.count('posts')
+        task['scraped_comments'] = checkpoint.count('comments')
+    with metrics.timed('scrape_listings', task):
+        if CONCURRENT_LISTINGS:
+            with ThreadPoolExecutor(max_workers=len(listings)) as pool:
+                futures = [
+                    pool.submit(fetch_listing, listing, to_record, known_fullnames, on_item, checkpoint=checkpoint, name=name)
+                    for listing, to_record, on_item, name in listings
+                ]
+                new_posts, new_comments = [future.result() for future in futures]
+        else:
+            new_posts, new_comments = [
+                fetch_listing(listing, to_record, known_fullnames, on_item, checkpoint=checkpoint, name=name)
+                for listing, to_record, on_item, name in listings
+            ]
+
+    # Resolve parent comments and submissions in bulk instead of one lazy fetch per comment
+    task['progress'] = 'Resolving parent comments and posts...'
+    with metrics.timed('resolve_parents', task):
+        resolved = resolve_fullnames(referenced_fullnames(new_comments))
+    return new_posts, new_comments, resolved
+
+def referenced_fullnames(comments):
+    """
+    Fullnames of the submissions and parent comments that comment records refer to.
+    """
+    fullnames = []
+    for record in comments:
+        fullnames.append(record.link_id)
+        if record.parent_id:
+            fullnames.append(record.parent_id)
+    return fullnames
+
 def scrape_reddit_user(username, task_id, tasks):
     """
     Scrape Reddit user data and update the tasks dict with progress.
+    Items already in the scrape cache are not fetched again: listings are
+    newest-first, so paging stops at the first cached item. Pages fetched by an
+    earlier attempt that did not finish are taken from its checkpoint.
+    Returns the path of a markdown file with the user's posts and comments,
+    or None if the user could not be scraped.
     """
-    output_data = ""
+    checkpoint = None
     try:
         tasks[task_id]['progress'] = 'Fetching user information...'
-        # Get user object
-        user = wait_and_retry(reddit.redditor, username)
-        if not user:
+
+        # Reddit usernames are case-insensitive
+        cache_key = f"{normalize_username(username)}_v{SCRAPE_CACHE_VERSION}"
+        cached = scrape_cache.get(cache_key) or {'posts': [], 'comments': []}
+        cached_posts = [record_from_dict(data) for data in cached['posts']]
+        cached_comments = [record_from_dict(data) for data in cached['comments']]
+        known_fullnames = {record.id for record in cached_posts + cached_comments}
+
+        # Keyed like the cache, so a resubmitted job resumes as well as a requeued one
+        checkpoint = ScrapeCheckpoint(scrape_checkpoints, cache_key)
+        if checkpoint.count('posts') or checkpoint.count('comments'):
+            print(f"Resuming scrape of {username} from a checkpoint "
+                  f"({checkpoint.count('posts')} posts, {checkpoint.count('comments')} comments)")
+            metrics.inc("scrape_resumed_total", help_text="Scrapes resumed from a checkpoint.")
+
+        # Totals are unknown until each listing is exhausted; Reddit does not
+        # expose submission/comment counts, so we count while we scrape
+        # instead of walking every listing twice.
+        tasks[task_id]['total_posts'] = None
+        tasks[task_id]['total_comments'] = None
+
+        # Initialize scraped counts
+        tasks[task_id]['scraped_posts'] = 0
+        tasks[task_id]['scraped_comments'] = 0
+
+        tasks[task_id]['progress'] = 'Scraping posts and comments...'
+        if SCRAPE_ENGINE == 'async':
+            import async_scraper
+            fetched = async_scraper.fetch_user_items(username, known_fullnames, tasks[task_id], checkpoint)
+        else:
+            fetched = fetch_user_items(username, known_fullnames, tasks[task_id], checkpoint)
+        if fetched is None:
+            checkpoint.clear()
             print(f"Unable to fetch data for user: {username}")
             tasks[task_id]['progress'] = 'Failed to fetch user data.'
             tasks[task_id]['status'] = 'Failed'
             return None
+        new_posts, new_comments, resolved = fetched
+        if not checkpoint.finished('posts', 'comments'):
+            # Caching part of a listing would hide the rest from later incremental scrapes
+            print(f"Scrape of {username} did not reach the end of its listings; keeping the checkpoint")
+            checkpoint.save()
+            return None
 
-        output_data += f"# Reddit User: {username}\n\n## 📝 Posts:\n\n"
+        metrics.inc("scraped_items_total", len(new_posts), help_text="Posts and comments scraped, by source.", kind="post", source="reddit")
+        metrics.inc("scraped_items_total", len(new_comments), kind="comment", source="reddit")
+        metrics.inc("scraped_items_total", len(cached_posts), kind="post", source="cache")
+        metrics.inc("scraped_items_total", len(cached_comments), kind="comment", source="cache")
 
-        # Count posts and comments
-        tasks[task_id]['progress'] = 'Counting total posts and comments...'
-        total_posts = wait_and_retry(lambda: sum(1 for _ in user.submissions.new(limit=None)))
-        total_comments = wait_and_retry(lambda: sum(1 for _ in user.comments.new(limit=None)))
-        tasks[task_id]['total_posts'] = total_posts
-        tasks[task_id]['total_comments'] = total_comments
-        tasks[task_id]['progress'] = f"Total Posts: {total_posts}, Total Comments: {total_comments}\n"
+        # A resumed scrape may have fetched items that another job has cached since
+        new_fullnames = {record.id for record in new_posts + new_comments}
+        posts = new_posts + [record for record in cached_posts if record.id not in new_fullnames]
+        tasks[task_id]['scraped_posts'] = len(posts)
+        tasks[task_id]['total_posts'] = len(posts)
 
-        # Initialize scraped counts
-        tasks[task_id]['scraped_posts'] = 0
-        tasks[task_id]['scraped_comments'] = 0
+        for record in new_comments:
+            submission = resolved.get(record.link_id)
+            if submission is not None:
+                record.title = submission.title
+            # parent_id is only set for replies, so it always refers to a comment
+            parent_comment = resolved.get(record.parent_id)
+            if parent_comment is not None:
+                record.parent_body = parent_comment.body
+        comments = new_comments + [record for record in cached_comments if record.id not in new_fullnames]
+        tasks[task_id]['scraped_comments'] = len(comments)
+        tasks[task_id]['total_comments'] = len(comments)
+
+        scrape_cache.set(cache_key, {
+            'posts': [record_to_dict(record) for record in posts],
+            'comments': [record_to_dict(record) for record in comments],
+        })
+        checkpoint.clear()
 
-        # Scrape posts
-        tasks[task_id]['progress'] = 'Scraping posts...'
-        submissions = wait_and_retry(user.submissions.new, limit=None)
-        if submissions:
-            for post in submissions:
-                try:
-                    post_data = (
-                        f"### Title: {post.title}\n"
-                        f"**Subreddit:** {post.subreddit}\n"
-                        f"**URL:** {post.url}\n"
-                        f"**Content:** {post.selftext or 'No Content'}\n\n"
-                    )
-                    output_data += post_data
-                    tasks[task_id]['scraped_posts'] += 1
-                    tasks[task_id]['progress'] = f"Scraping posts... ({tasks[task_id]['scraped_posts']}/{tasks[task_id]['total_posts']})"
-                except Exception as post_error:
-                    print(f"Error with post: {post_error}")
-
-        # Add section for comments
-        output_data += "\n## 💬 Comments:\n\n"
-
-        # Scrape comments
-        tasks[task_id]['progress'] = 'Scraping comments...'
-        comments = wait_and_retry(user.comments.new, limit=None)
-        if comments:
-            for comment in comments:
-                try:
-                    comment_data = (
-                        f"### Comment:\n{comment.body}\n"
-                        f"**Subreddit:** {comment.subreddit}\n"
-                        f"**Post:** {comment.submission.title}\n"
-                    )
-
-                    # Add parent comment if replying
-                    if not comment.is_root:
-                        parent_comment = wait_and_retry(comment.parent)
-                        if isinstance(parent_comment, praw.models.Comment):
-                            comment_data += f"**Parent Comment:** {parent_comment.body}\n"
-
-                    comment_data += "\n"
-                    output_data += comment_data
-                    tasks[task_id]['scraped_comments'] += 1
-                    tasks[task_id]['progress'] = f"Scraping comments... ({tasks[task_id]['scraped_comments']}/{tasks[task_id]['total_comments']})"
-                except Exception as comment_error:
-                    print(f"Error with comment: {comment_error}")
+        # Stream the markdown straight to the file that is handed to Gemini
+        output_path = os.path.join(tempfile.gettempdir(), f"{username}_{uuid.uuid4().hex}_reddit_full_data.md")
+        if COMPACT_SCRAPED_DATA:
+            with metrics.timed('compact', tasks[task_id]):
+                sent_chars = write_rendered(output_path, render_compact_markdown(username, posts, comments))
+        else:
+            with metrics.timed('render_markdown', tasks[task_id]):
+                write_rendered(output_path, render_markdown(username, posts, comments))
+        sent_bytes = os.path.getsize(output_path)
+        metrics.inc("scraped_bytes_total", sent_bytes, help_text="Bytes of scraped markdown handed to Gemini.")
 
         print("\nScraping completed!")
         tasks[task_id]['progress'] = 'Scraping completed. Processing data...'
+        if COMPACT_SCRAPED_DATA:
+            # What the plain rendering would have sent, worked out without rendering it again
+            raw_chars = markdown_length(username, posts, comments)
+            metrics.inc("compaction_saved_chars_total", raw_chars - sent_chars, help_text="Characters of scraped markdown removed by compaction.")
+            saved = 1 - sent_chars / raw_chars if raw_chars else 0
+            print(f"Compacted scraped data from {raw_chars} to {sent_chars} characters (about {(raw_chars - sent_chars) // 4} fewer tokens, -{saved:.0%}).")
+            tasks[task_id]['progress'] = f'Scraping completed, compacted by {saved:.0%}. Processing data...'
         tasks[task_id]['status'] = 'Processing'
-        return output_data
+        return output_path
     
-    except:
-        pass
\ No newline at end of file
+    except Exception as e:
+        print(f"Error scraping data for user {username}: {e}")
+        # Keep the pages fetched so far for the next attempt
+        if checkpoint is not None:
+            checkpoint.save()
+        return None
@@ -0,0 +1,152 @@
+# report_store.py
+
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Job, Report
+
+class ReportStore:
+    """
+    Content-addressed storage for generated reports.
+    Each report is written once under REPORT_STORE_DIR as <sha256>.md, next to a
+    gzipped copy for clients that accept it, and described by a row in the Report
+    table. Downloads keep a report alive; reports not downloaded for REPORT_STORE_TTL
+    seconds are removed, together with the finished jobs that point at them, by a
+    cleanup thread that runs every REPORT_CLEANUP_INTERVAL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cleanup_thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPORT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'reddit_gemini_reports'))
+        app.config.setdefault('REPORT_STORE_TTL', 7 * 24 * 60 * 60)
+        app.config.setdefault('REPORT_CLEANUP_INTERVAL', 60 * 60)
+        self.app = app
+        # Started lazily for the same reason as the job workers
+        app.before_request(self.start)
+
+    def path(self, report_id, compressed=False):
+        """
+        Path of a stored report, or of its gzipped copy.
+        """
+        filename = f"{report_id}.md.gz" if compressed else f"{report_id}.md"
+        return os.path.join(self.app.config['REPORT_STORE_DIR'], filename)
+
+    def add(self, source_path):
+        """
+        Move a generated report file into the store and return its id (the content hash).
+        A report with the same content is only stored once.
+        """
+        content_hash = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(block)
+        report_id = content_hash.hexdigest()
+        size = os.path.getsize(source_path)
+
+        directory = self.app.config['REPORT_STORE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path(report_id)):
+            os.remove(source_path)
+        else:
+            # Compress to a temp file first so readers never see a half-written copy
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with open(source_path, "rb") as src, os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp_path, self.path(report_id, compressed=True))
+            shutil.move(source_path, self.path(report_id))
+
+        with self.app.app_context():
+            report = db.session.get(Report, report_id)
+            if report is None:
+                db.session.add(Report(id=report_id, size=size))
+            else:
+                report.last_accessed_at = datetime.utcnow()
+            db.session.commit()
+        return report_id
+
+    def touch(self, report_id):
+        """
+        Record a download so the report is kept for another TTL.
+        """
+        try:
+            Report.query.filter_by(id=report_id).update(
+                {'last_accessed_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error updating report {report_id}: {e}")
+
+    def start(self):
+        """
+        Start the cleanup thread once per process.
+        """
+        if self._cleanup_thread:
+            return
+        with self._lock:
+            if self._cleanup_thread:
+                return
+            self._cleanup_thread = threading.Thread(target=self._cleanup_loop, name="report-cleanup", daemon=True)
+            self._cleanup_thread.start()
+
+    def cleanup(self):
+        """
+        Remove expired reports and their jobs, and finished jobs without a report
+        that are older than the TTL. Returns the number of reports removed.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['REPORT_STORE_TTL'])
+        removed = 0
+        with self.app.app_context():
+            try:
+                Job.query.filter(
+                    Job.status.in_(('Completed', 'Failed')),
+                    Job.report_id.is_(None),
+                    Job.updated_at < cutoff,
+                ).delete(synchronize_session=False)
+                db.session.commit()
+
+                expired = [row.id for row in Report.query.filter(Report.last_accessed_at < cutoff).with_entities(Report.id)]
+                for report_id in expired:
+                    # Re-check the timestamp in case the report was downloaded or regenerated meanwhile
+                    report = Report.query.filter(
+                        Report.id == report_id,
+                        Report.last_accessed_at < cutoff,
+                    ).with_for_update().first()
+                    if report is None:
+                        db.session.commit()
+                        continue
+                    Job.query.filter_by(report_id=report_id).delete(synchronize_session=False)
+                    db.session.delete(report)
+                    db.session.commit()
+                    removed += 1
+                    for compressed in (False, True):
+                        try:
+                            os.remove(self.path(report_id, compressed))
+                        except OSError:
+                            pass
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error cleaning up reports: {e}")
+        return removed
+
+    def _cleanup_loop(self):
+        while True:
+            removed = self.cleanup()
+            if removed:
+                print(f"Removed {removed} expired reports.")
+            time.sleep(self.app.config['REPORT_CLEANUP_INTERVAL'])
+
+report_store = ReportStore()